@@ -0,0 +1,60 @@
+from __future__ import annotations
+import gzip
+import json
+import os
+import re
+import tempfile
+from dataclasses import asdict
+from pathlib import Path
+from typing import Optional, Union
+
+from application.ports.response_archive_port import ArchivedResponse, ResponseArchivePort
+
+_UNSAFE_CHARS_RE = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+class FileResponseArchive(ResponseArchivePort):
+    """
+    Adapter that stores SII responses on the local filesystem.
+
+    Each response is kept as `<root>/<rut>/<kind>/<name>.gz` (the gzipped body)
+    next to a `<name>.json` file with the request metadata. Files are
+    written atomically, so a crash never leaves a truncated entry behind.
+    """
+
+    def __init__(self, root: Union[str, os.PathLike], compresslevel: int = 6):
+        self._root = Path(root)
+        self._compresslevel = compresslevel
+
+    def _paths(self, rut: str, kind: str, name: str) -> tuple[Path, Path]:
+        """Returns the (body, metadata) paths of an entry."""
+        rut, kind, name = (_UNSAFE_CHARS_RE.sub("_", p) for p in (rut, kind, name))
+        folder = self._root / rut / kind
+        return folder / f"{name}.gz", folder / f"{name}.json"
+
+    def _write_atomic(self, path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def save(self, rut: str, kind: str, name: str, response: ArchivedResponse) -> None:
+        body_path, metadata_path = self._paths(rut, kind, name)
+        metadata = asdict(response)
+        del metadata["content"]
+        self._write_atomic(body_path, gzip.compress(response.content, self._compresslevel))
+        self._write_atomic(metadata_path, json.dumps(metadata, default=str).encode("utf-8"))
+
+    def load(self, rut: str, kind: str, name: str) -> Optional[ArchivedResponse]:
+        body_path, metadata_path = self._paths(rut, kind, name)
+        try:
+            content = gzip.decompress(body_path.read_bytes())
+            metadata = json.loads(metadata_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        return ArchivedResponse(content=content, **metadata)
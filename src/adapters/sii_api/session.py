@@ -0,0 +1,121 @@
+from __future__ import annotations
+import threading
+import weakref
+from typing import Callable
+
+import requests
+from requests.cookies import RequestsCookieJar
+from requests.structures import CaseInsensitiveDict
+from requests.utils import default_headers
+
+from adapters.sii_api.utils import build_session_with_retries
+
+
+class LockedCookieJar(RequestsCookieJar):
+    """
+    Cookie jar that can be shared by sessions running in different threads.
+
+    `CookieJar` already locks adding and extracting cookies; this also locks
+    iteration and the bulk operations of `RequestsCookieJar`, which walk the
+    jar and would otherwise fail if another thread stores a cookie meanwhile.
+    """
+
+    def __iter__(self):
+        with self._cookies_lock:
+            return iter(list(super().__iter__()))
+
+    def set(self, name, value, **kwargs):
+        with self._cookies_lock:
+            return super().set(name, value, **kwargs)
+
+    def update(self, other):
+        with self._cookies_lock:
+            super().update(other)
+
+
+class LockedHeaders(CaseInsensitiveDict):
+    """Headers that can be updated by one thread while others send requests."""
+
+    def __init__(self, data=None, **kwargs):
+        self._lock = threading.RLock()
+        super().__init__(data, **kwargs)
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        with self._lock:
+            super().__delitem__(key)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(super().__iter__()))
+
+    def items(self):
+        with self._lock:
+            return [(key, value) for key, value in self._store.values()]
+
+    def copy(self):
+        with self._lock:
+            return CaseInsensitiveDict(self._store.values())
+
+
+class _ThreadSession:
+    """Holder of one thread's session, kept only by that thread's local storage."""
+
+    def __init__(self, session: requests.Session):
+        self.session = session
+        # Closes the session once, either from `close()` or when the thread ends.
+        self.close = weakref.finalize(self, session.close)
+
+
+class ThreadSafeSession:
+    """
+    Session facade that gives every thread its own `requests.Session`.
+
+    Connection pools are per thread, while the cookie jar and headers are
+    shared, so a login performed in one thread authenticates all of them.
+    A thread's session is closed when the thread ends, so short-lived
+    threads do not accumulate sessions or open connections.
+    It exposes the subset of the `requests.Session` API used by the services.
+    """
+
+    def __init__(self, session_factory: Callable[[], requests.Session] = build_session_with_retries):
+        self._session_factory = session_factory
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._holders: weakref.WeakSet[_ThreadSession] = weakref.WeakSet()
+        self.cookies = LockedCookieJar()
+        self.headers = LockedHeaders(default_headers())
+
+    def _current(self) -> requests.Session:
+        """Returns the calling thread's session, creating it on first use."""
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            session = self._session_factory()
+            session.cookies = self.cookies
+            session.headers = self.headers
+            holder = self._local.holder = _ThreadSession(session)
+            with self._lock:
+                self._holders.add(holder)
+        return holder.session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        return self._current().request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self._current().get(url, **kwargs)
+
+    def post(self, url: str, data=None, json=None, **kwargs) -> requests.Response:
+        return self._current().post(url, data=data, json=json, **kwargs)
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        return self._current().head(url, **kwargs)
+
+    def close(self) -> None:
+        """Closes the sessions of every live thread."""
+        with self._lock:
+            holders = list(self._holders)
+        for holder in holders:
+            holder.close()
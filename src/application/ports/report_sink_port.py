@@ -0,0 +1,18 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Union
+
+if TYPE_CHECKING:
+    from domain.models import AnnualReport, MonthlyReport
+
+
+class ReportSink(ABC):
+    """Puerto para un destino de informes parseados."""
+
+    @abstractmethod
+    def write(self, report: Union[AnnualReport, MonthlyReport]) -> None:
+        """Debe persistir o procesar el informe recibido."""
+        ...
+
+    def close(self) -> None:
+        """Libera los recursos del destino. Por defecto no hace nada."""
@@ -0,0 +1,37 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Dict, Optional
+
+
+class ArchiveMode(Enum):
+    """Modo de uso del archivo de respuestas del SII."""
+    LIVE = "live"
+    RECORD = "record"
+    REPLAY = "replay"
+
+
+@dataclass
+class ArchivedResponse:
+    """Respuesta cruda del SII junto a los metadatos de la solicitud."""
+    content: bytes
+    content_type: str = ""
+    encoding: Optional[str] = None
+    url: str = ""
+    params: Dict[str, Any] = field(default_factory=dict)
+    fetched_at: float = 0.0
+
+
+class ResponseArchivePort(ABC):
+    """Puerto para almacenar y recuperar respuestas crudas del SII."""
+
+    @abstractmethod
+    def save(self, rut: str, kind: str, name: str, response: ArchivedResponse) -> None:
+        """Debe guardar la respuesta bajo (rut, kind, name), reemplazando la anterior."""
+        ...
+
+    @abstractmethod
+    def load(self, rut: str, kind: str, name: str) -> Optional[ArchivedResponse]:
+        """Debe devolver la respuesta guardada, o None si no existe."""
+        ...
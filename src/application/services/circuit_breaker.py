@@ -0,0 +1,102 @@
+from __future__ import annotations
+import threading
+import time
+from enum import Enum
+from typing import Callable, Dict
+
+
+class CircuitState(Enum):
+    """State of a circuit breaker."""
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker for a single host.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    requests fail fast. Once `reset_timeout` seconds have passed, up to
+    `half_open_max_calls` trial requests are let through: a success closes
+    the circuit, a failure opens it again.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._half_open_max_calls = half_open_max_calls
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trials = 0
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def _refresh(self) -> None:
+        """Moves an open circuit to half-open once the reset timeout has passed."""
+        if self._state is CircuitState.OPEN and self._clock() - self._opened_at >= self._reset_timeout:
+            self._state = CircuitState.HALF_OPEN
+            self._trials = 0
+
+    def allow(self) -> bool:
+        """Returns True if a request may be attempted now."""
+        with self._lock:
+            self._refresh()
+            if self._state is CircuitState.CLOSED:
+                return True
+            if self._state is CircuitState.HALF_OPEN and self._trials < self._half_open_max_calls:
+                self._trials += 1
+                return True
+            return False
+
+    def record_success(self) -> None:
+        """Records a successful request, closing the circuit."""
+        with self._lock:
+            self._state = CircuitState.CLOSED
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        """Records a failed request, opening the circuit if needed."""
+        with self._lock:
+            self._failures += 1
+            if self._state is CircuitState.HALF_OPEN or self._failures >= self._failure_threshold:
+                self._state = CircuitState.OPEN
+                self._opened_at = self._clock()
+
+
+class CircuitBreakerRegistry:
+    """
+    Circuit breakers per SII host. A registry can be shared by several
+    `BH` instances so that all taxpayers see the same host health.
+    """
+
+    def __init__(self, **breaker_options):
+        """
+        Args:
+            **breaker_options: Options for each CircuitBreaker
+                (failure_threshold, reset_timeout, half_open_max_calls, clock).
+        """
+        self._options = breaker_options
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, host: str) -> CircuitBreaker:
+        """Returns the breaker of a host, creating it on first use."""
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = self._breakers[host] = CircuitBreaker(**self._options)
+            return breaker
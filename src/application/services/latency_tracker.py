@@ -0,0 +1,131 @@
+from __future__ import annotations
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional
+
+
+@dataclass
+class LatencyPolicy:
+    """
+    Configuration of latency-aware timeouts and request hedging.
+
+    Attributes:
+        adaptive_timeouts: Derive each endpoint's timeout from its observed p99.
+        hedging: Issue a duplicate of slow idempotent GETs; the first response wins.
+        window: Number of recent latencies kept per endpoint.
+        min_samples: Observations needed before timeouts or hedge delays adapt.
+        timeout_multiplier: Timeout is the observed p99 times this factor.
+        min_timeout: Lower bound of an adaptive timeout, in seconds. The
+            endpoint's default timeout is the upper bound.
+        hedge_percentile: Percentile of the observed latency after which a
+            hedge is issued.
+        min_hedge_delay: Lower bound of the hedge delay, in seconds.
+        max_hedge_delay: Upper bound of the hedge delay, in seconds.
+        hedge_budget: Hedges earned per request, e.g. 0.05 adds at most 5%
+            extra load. Unused budget accumulates only up to `hedge_burst`.
+        hedge_burst: Maximum hedges that can be issued back to back, so a
+            long healthy period cannot be spent all at once during an outage.
+        max_hedges_in_flight: Size of the pool that sends the duplicates;
+            no hedge is issued while it is busy.
+    """
+    adaptive_timeouts: bool = True
+    hedging: bool = False
+    window: int = 200
+    min_samples: int = 20
+    timeout_multiplier: float = 3.0
+    min_timeout: float = 5.0
+    hedge_percentile: float = 0.95
+    min_hedge_delay: float = 0.05
+    max_hedge_delay: float = 10.0
+    hedge_budget: float = 0.05
+    hedge_burst: float = 5.0
+    max_hedges_in_flight: int = 4
+
+
+@dataclass
+class LatencyStats:
+    """Counters of requests and hedges issued."""
+    requests: int = 0
+    hedges: int = 0
+    hedge_wins: int = 0
+
+
+class LatencyTracker:
+    """Thread-safe rolling window of latencies per endpoint."""
+
+    def __init__(self, policy: LatencyPolicy):
+        self._policy = policy
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = {}
+        self._stats = LatencyStats()
+        self._hedge_tokens = 0.0
+
+    @property
+    def policy(self) -> LatencyPolicy:
+        return self._policy
+
+    def observe(self, endpoint: str, seconds: float) -> None:
+        """Records the latency of a successful request."""
+        with self._lock:
+            samples = self._samples.get(endpoint)
+            if samples is None:
+                samples = self._samples[endpoint] = deque(maxlen=self._policy.window)
+            samples.append(seconds)
+
+    def percentile(self, endpoint: str, q: float) -> Optional[float]:
+        """Returns the q-th percentile (0-1) of an endpoint, or None without enough samples."""
+        with self._lock:
+            samples = sorted(self._samples.get(endpoint, ()))
+        if len(samples) < self._policy.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def timeout_for(self, endpoint: str, default: float) -> float:
+        """Returns the timeout to use for an endpoint, never above its default."""
+        if not self._policy.adaptive_timeouts:
+            return default
+        p99 = self.percentile(endpoint, 0.99)
+        if p99 is None:
+            return default
+        return min(default, max(self._policy.min_timeout, p99 * self._policy.timeout_multiplier))
+
+    def hedge_delay(self, endpoint: str) -> Optional[float]:
+        """Returns how long to wait before hedging, or None if the request must not be hedged."""
+        if not self._policy.hedging:
+            return None
+        p = self.percentile(endpoint, self._policy.hedge_percentile)
+        if p is None:
+            return None
+        return min(self._policy.max_hedge_delay, max(self._policy.min_hedge_delay, p))
+
+    def record_request(self) -> None:
+        """Counts a request, earning `hedge_budget` hedge tokens up to `hedge_burst`."""
+        with self._lock:
+            self._stats.requests += 1
+            self._hedge_tokens = min(
+                self._policy.hedge_burst, self._hedge_tokens + self._policy.hedge_budget
+            )
+
+    def try_acquire_hedge(self) -> bool:
+        """Spends a hedge token if one is available."""
+        with self._lock:
+            if self._hedge_tokens < 1 - 1e-9:  # tolerate float drift, e.g. 10 * 0.1
+                return False
+            self._hedge_tokens -= 1
+            self._stats.hedges += 1
+            return True
+
+    def record_hedge_win(self) -> None:
+        """Counts a hedge that answered before the original request."""
+        with self._lock:
+            self._stats.hedge_wins += 1
+
+    def stats(self) -> LatencyStats:
+        """Returns a snapshot of the request and hedge counters."""
+        with self._lock:
+            return LatencyStats(
+                requests=self._stats.requests,
+                hedges=self._stats.hedges,
+                hedge_wins=self._stats.hedge_wins,
+            )
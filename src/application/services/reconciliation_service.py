@@ -0,0 +1,119 @@
+from __future__ import annotations
+from itertools import accumulate, chain
+from typing import Iterable, List, Optional, Tuple
+
+from domain.models import (
+    AnnualReport,
+    Discrepancy,
+    MonthlyInvoiceSummary,
+    MonthlyReport,
+    ReconciliationReport,
+)
+
+VOIDED_STATUS = "A"
+
+
+class ReconciliationService:
+    """
+    Service to check that monthly invoice details add up to their totals
+    and to the corresponding entry of the annual report.
+
+    Invoices of the whole portfolio are flattened into columns once and
+    each amount column is turned into prefix sums, so every monthly total is
+    a subtraction instead of a sum over its invoices. Folio ranges still
+    take a min/max over each report's slice of the folio column.
+
+    Voided invoices are treated like any other row: they count towards the
+    amount sums and the folio range, since a voided boleta still uses up its
+    folio. They are only told apart for the issued and voided counts.
+    """
+
+    def reconcile(
+        self,
+        monthly_reports: Iterable[MonthlyReport],
+        annual_reports: Iterable[AnnualReport] = (),
+    ) -> ReconciliationReport:
+        """
+        Reconciles a portfolio of monthly reports.
+
+        Args:
+            monthly_reports: Monthly reports of any number of taxpayers and years.
+            annual_reports: (Optional) Annual reports to check the monthly
+                reports against, matched by (rut, year).
+
+        Returns:
+            ReconciliationReport with every discrepancy found.
+        """
+        reports = list(monthly_reports)
+        annual_index = {(a.rut, a.year): a for a in annual_reports}
+
+        # Segment boundaries of each report within the flattened columns.
+        offsets = [0, *accumulate(len(r.invoices) for r in reports)]
+        invoices = list(chain.from_iterable(r.invoices for r in reports))
+
+        fees = self._prefix([i.total_fee for i in invoices])
+        issuer_wh = self._prefix([i.issuer_withholding for i in invoices])
+        recipient_wh = self._prefix([i.recipient_withholding for i in invoices])
+        net = self._prefix([i.net_amount for i in invoices])
+        voided = self._prefix([self._is_voided(i.status, i.void_date) for i in invoices])
+        folios = [i.number for i in invoices]
+
+        result = ReconciliationReport(checked_months=len(reports), checked_invoices=len(invoices))
+        add = result.discrepancies.extend
+
+        for idx, report in enumerate(reports):
+            start, end = offsets[idx], offsets[idx + 1]
+            add(self._compare(report, (
+                ("invoice_count", report.total_invoices, end - start),
+                ("total_fees", report.total_fees, fees[end] - fees[start]),
+                ("total_issuer_withholding", report.total_issuer_withholding, issuer_wh[end] - issuer_wh[start]),
+                ("total_recipient_withholding", report.total_recipient_withholding, recipient_wh[end] - recipient_wh[start]),
+                ("total_net_amount", report.total_net_amount, net[end] - net[start]),
+            )))
+
+            summary = self._annual_month(annual_index.get((report.rut, report.year)), report.month)
+            if summary is None:
+                continue
+
+            voided_count = voided[end] - voided[start]
+            used = folios[start:end]
+            add(self._compare(report, (
+                ("issued_count", summary.issued_count, (end - start) - voided_count),
+                ("voided_count", summary.voided_count, voided_count),
+                ("start_folio", summary.start_folio, min(used) if used else None),
+                ("end_folio", summary.end_folio, max(used) if used else None),
+            )))
+
+        return result
+
+    @staticmethod
+    def _prefix(column: List[int]) -> List[int]:
+        """Returns the prefix sums of a column, starting at 0."""
+        return list(accumulate(column, initial=0))
+
+    @staticmethod
+    def _is_voided(status: str, void_date: Optional[str]) -> int:
+        """Returns 1 if the invoice is voided, 0 otherwise."""
+        return int(bool(void_date) or (status or "").strip().upper() == VOIDED_STATUS)
+
+    @staticmethod
+    def _annual_month(annual: Optional[AnnualReport], month: int) -> Optional[MonthlyInvoiceSummary]:
+        """Returns the annual summary entry for a month (1-12), if available."""
+        if annual is None or not 1 <= month <= len(annual.months):
+            return None
+        return annual.months[month - 1]
+
+    @staticmethod
+    def _compare(
+        report: MonthlyReport,
+        checks: Tuple[Tuple[str, Optional[int], Optional[int]], ...],
+    ) -> List[Discrepancy]:
+        """Builds a Discrepancy for every (field, expected, actual) that differs."""
+        return [
+            Discrepancy(
+                rut=report.rut, year=report.year, month=report.month,
+                field=name, expected=expected, actual=actual,
+            )
+            for name, expected, actual in checks
+            if expected != actual
+        ]
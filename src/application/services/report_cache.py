@@ -0,0 +1,154 @@
+from __future__ import annotations
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class CacheStats:
+    """Counters of the report cache."""
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    evictions: int = 0
+    size: int = 0
+
+
+class _InFlight:
+    """A load in progress that concurrent callers can wait on."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        # Set by `invalidate()`; the result is still returned but not cached.
+        self.dropped = False
+
+
+class ReportCache:
+    """
+    Bounded in-memory LRU of parsed reports with single-flight loading.
+
+    Concurrent callers asking for the same key share one in-flight load
+    instead of each fetching and parsing the report. Entries expire after
+    `ttl_seconds` and the least recently used one is evicted once the cache
+    holds `max_entries`. The cache is thread-safe and may be shared by
+    several `BH` instances, since keys include the taxpayer RUT.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1.")
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._in_flight: dict[Hashable, _InFlight] = {}
+        self._stats = CacheStats()
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], T]) -> T:
+        """
+        Returns the cached value for `key`, loading it if needed.
+
+        Args:
+            key: Cache key, e.g. (rut, year, month).
+            loader: Callable that fetches and parses the value. Only one
+                caller per key runs it at a time; the others wait for it.
+
+        Returns:
+            The cached or freshly loaded value. If the load fails, every
+            waiting caller receives the same exception.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    self._stats.hits += 1
+                    return value
+                del self._entries[key]
+
+            flight = self._in_flight.get(key)
+            if flight is not None:
+                self._stats.coalesced += 1
+                leader = False
+            else:
+                flight = self._in_flight[key] = _InFlight()
+                self._stats.misses += 1
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = loader()
+        except BaseException as e:
+            flight.error = e
+            raise
+        else:
+            self._store(key, flight)
+            return flight.result
+        finally:
+            with self._lock:
+                if self._in_flight.get(key) is flight:
+                    del self._in_flight[key]
+            flight.done.set()
+
+    def _store(self, key: Hashable, flight: _InFlight) -> None:
+        """
+        Stores the result of a load, evicting the least recently used entries
+        if full. Skipped if the key was invalidated while the load ran.
+        """
+        with self._lock:
+            if flight.dropped:
+                return
+            value = flight.result
+            self._entries[key] = (self._clock() + self._ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self._stats.evictions += 1
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """
+        Removes one entry, or every entry if `key` is None.
+
+        Loads in flight for those keys are not cached when they finish, so
+        the next call after `invalidate()` always loads a fresh value.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                flights = list(self._in_flight.values())
+                self._in_flight.clear()
+            else:
+                self._entries.pop(key, None)
+                flight = self._in_flight.pop(key, None)
+                flights = [flight] if flight is not None else []
+            for flight in flights:
+                flight.dropped = True
+
+    def stats(self) -> CacheStats:
+        """Returns a snapshot of the cache counters."""
+        with self._lock:
+            return CacheStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                coalesced=self._stats.coalesced,
+                evictions=self._stats.evictions,
+                size=len(self._entries),
+            )
@@ -0,0 +1,352 @@
+from __future__ import annotations
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Iterable, List, Optional, Tuple, Union
+
+from application.ports.report_sink_port import ReportSink
+from application.services.js_parsing_service import JsParsingService
+from application.services.parsing_service import ParsingService
+from domain.models import AnnualReport, MonthlyReport
+
+if TYPE_CHECKING:
+    from application.services.sii_service import SiiService
+
+Period = Tuple[int, Optional[int]]
+Report = Union[AnnualReport, MonthlyReport]
+
+_DONE = object()
+_POLL_SECONDS = 0.1
+
+# Parser of the current worker process, created on first use.
+_worker_parser: Optional[ParsingService] = None
+
+
+def _parse_in_worker(html: str, monthly: bool) -> Tuple[Report, float]:
+    """Parses a report inside a pool worker. Returns the report and the seconds spent."""
+    global _worker_parser
+    if _worker_parser is None:
+        _worker_parser = ParsingService(js_parser=JsParsingService())
+    started = time.perf_counter()
+    if monthly:
+        report = _worker_parser.parse_monthly_report_from_html(html)
+    else:
+        report = _worker_parser.parse_annual_report_from_html(html)
+    return report, time.perf_counter() - started
+
+
+def _process_context() -> multiprocessing.context.BaseContext:
+    """Start method for parser processes; forking a multi-threaded process is unsafe."""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+class CallbackSink(ReportSink):
+    """Sink that hands every report to a callable."""
+
+    def __init__(self, callback: Callable[[Report], None]):
+        self._callback = callback
+
+    def write(self, report: Report) -> None:
+        self._callback(report)
+
+
+@dataclass
+class StageMetrics:
+    """Counters of a single pipeline stage."""
+    name: str
+    processed: int = 0
+    failed: int = 0
+    busy_seconds: float = 0.0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Items processed per second of pipeline wall time."""
+        return self.processed / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+@dataclass
+class PipelineFailure:
+    """
+    A period that could not be fetched, parsed or written. Stage is
+    "cancelled" for periods dropped by `ReportPipeline.cancel()`.
+    """
+    year: int
+    month: Optional[int]
+    stage: str
+    error: str
+
+
+@dataclass
+class PipelineMetrics:
+    """Result of a pipeline run."""
+    fetch: StageMetrics = field(default_factory=lambda: StageMetrics("fetch"))
+    parse: StageMetrics = field(default_factory=lambda: StageMetrics("parse"))
+    sink: StageMetrics = field(default_factory=lambda: StageMetrics("sink"))
+    elapsed_seconds: float = 0.0
+    cancelled: bool = False
+    failures: List[PipelineFailure] = field(default_factory=list)
+
+
+class ReportPipeline:
+    """
+    Staged fetch/parse/write pipeline for large backfills.
+
+    Fetcher threads download raw HTML with the shared `SiiService` (sessions
+    stay in this process) and push it through a bounded queue to a process
+    pool, where BeautifulSoup/QuickJS parsing runs outside the GIL of the
+    network threads. Parsed reports are written to the sinks by a single
+    thread, so sinks need not be thread-safe.
+
+    Backpressure: fetchers block when the raw queue is full, and no more
+    parse jobs are submitted while `max_in_flight` reports are being parsed
+    or waiting for the sinks.
+
+    Every period given to `run()` is either written to the sinks or listed
+    in `PipelineMetrics.failures`, so a failed or cancelled run can be
+    resumed with just the failed periods.
+    """
+
+    def __init__(
+        self,
+        sii_service: SiiService,
+        sinks: Iterable[ReportSink],
+        fetch_workers: int = 4,
+        parse_workers: Optional[int] = None,
+        queue_size: int = 32,
+        max_in_flight: Optional[int] = None,
+        executor: Optional[Executor] = None,
+    ):
+        """
+        Args:
+            sii_service: Logged-in service used by the fetchers.
+            sinks: Destinations of the parsed reports. They stay owned by the
+                caller: the pipeline never closes them, so they can be reused
+                across runs or shared with other code.
+            fetch_workers: Number of network fetcher threads.
+            parse_workers: Number of parser processes. Defaults to the CPU count.
+            queue_size: Capacity of the queue between fetchers and parsers.
+            max_in_flight: Maximum reports being parsed or waiting for the
+                sinks. Defaults to twice the number of parser processes.
+            executor: (Optional) Executor to parse with instead of a private
+                process pool. It is not shut down by the pipeline.
+        """
+        self._sii_service = sii_service
+        self._sinks = list(sinks)
+        self._fetch_workers = max(1, fetch_workers)
+        self._parse_workers = parse_workers
+        self._queue_size = queue_size
+        self._max_in_flight = max_in_flight or 2 * (parse_workers or os.cpu_count() or 1)
+        self._executor = executor
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._metrics = PipelineMetrics()
+
+    def cancel(self) -> None:
+        """
+        Stops the pipeline. Periods being fetched and reports already being
+        parsed are finished; every other period is dropped and recorded as a
+        "cancelled" failure.
+        """
+        self._cancel.set()
+
+    def metrics(self) -> PipelineMetrics:
+        """Returns the metrics of the current or last run."""
+        return self._metrics
+
+    def run(self, periods: Iterable[Period]) -> PipelineMetrics:
+        """
+        Fetches, parses and writes every period. Blocks until done or cancelled.
+
+        Args:
+            periods: (year, month) pairs; month None means the annual report.
+
+        Returns:
+            PipelineMetrics with per-stage counters and the failed periods.
+        """
+        self._cancel.clear()
+        self._metrics = PipelineMetrics()
+        started = time.perf_counter()
+
+        periods_q: queue.Queue = queue.Queue(maxsize=self._queue_size)
+        raw_q: queue.Queue = queue.Queue(maxsize=self._queue_size)
+        parsed_q: queue.Queue = queue.Queue()
+        slots = threading.BoundedSemaphore(self._max_in_flight)
+
+        executor = self._executor or ProcessPoolExecutor(
+            max_workers=self._parse_workers, mp_context=_process_context()
+        )
+        fetchers = [
+            threading.Thread(target=self._fetch_loop, args=(periods_q, raw_q), daemon=True)
+            for _ in range(self._fetch_workers)
+        ]
+        dispatcher = threading.Thread(
+            target=self._dispatch_loop, args=(raw_q, parsed_q, slots, executor), daemon=True
+        )
+        writer = threading.Thread(target=self._sink_loop, args=(parsed_q, slots), daemon=True)
+        for t in (*fetchers, dispatcher, writer):
+            t.start()
+
+        try:
+            periods = iter(periods)
+            for period in periods:
+                if not self._put(periods_q, period):
+                    self._drop(period)
+                    for rest in periods:
+                        self._drop(rest)
+                    break
+            for _ in fetchers:
+                self._put(periods_q, _DONE)
+            for t in fetchers:
+                t.join()
+            self._put(raw_q, _DONE)
+            dispatcher.join()
+            writer.join()
+            # Left in the queues by a cancel.
+            for q in (periods_q, raw_q):
+                while not q.empty():
+                    item = q.get_nowait()
+                    if item is not _DONE:
+                        self._drop(item if q is periods_q else item[0])
+        except BaseException:
+            self.cancel()
+            raise
+        finally:
+            if self._executor is None:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+        elapsed = time.perf_counter() - started
+        self._metrics.elapsed_seconds = elapsed
+        self._metrics.cancelled = self._cancel.is_set()
+        for stage in (self._metrics.fetch, self._metrics.parse, self._metrics.sink):
+            stage.elapsed_seconds = elapsed
+        return self._metrics
+
+    def _put(self, q: queue.Queue, item: object) -> bool:
+        """Blocking put that gives up when the pipeline is cancelled."""
+        while not self._cancel.is_set():
+            try:
+                q.put(item, timeout=_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue) -> object:
+        """Blocking get that returns _DONE when the pipeline is cancelled."""
+        while not self._cancel.is_set():
+            try:
+                return q.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _fail(self, stage: StageMetrics, period: Period, error: BaseException) -> None:
+        with self._lock:
+            stage.failed += 1
+            self._metrics.failures.append(
+                PipelineFailure(year=period[0], month=period[1], stage=stage.name, error=str(error))
+            )
+
+    def _drop(self, period: Period) -> None:
+        """Records a period dropped by a cancel."""
+        with self._lock:
+            self._metrics.failures.append(
+                PipelineFailure(year=period[0], month=period[1], stage="cancelled", error="Cancelled")
+            )
+
+    def _fetch_loop(self, periods_q: queue.Queue, raw_q: queue.Queue) -> None:
+        """Network stage: downloads the raw HTML of each period."""
+        stage = self._metrics.fetch
+        while True:
+            period = self._get(periods_q)
+            if period is _DONE:
+                return
+            year, month = period
+            started = time.perf_counter()
+            try:
+                if month:
+                    html = self._sii_service.get_monthly_report_html(year, month)
+                else:
+                    html = self._sii_service.get_annual_report_html(year)
+            except Exception as e:
+                self._fail(stage, period, e)
+                continue
+            with self._lock:
+                stage.processed += 1
+                stage.busy_seconds += time.perf_counter() - started
+            if not self._put(raw_q, (period, html)):
+                self._drop(period)
+                return
+
+    def _dispatch_loop(
+        self,
+        raw_q: queue.Queue,
+        parsed_q: queue.Queue,
+        slots: threading.BoundedSemaphore,
+        executor: Executor,
+    ) -> None:
+        """Parse stage: submits raw HTML to the executor, bounded by `slots`."""
+        while True:
+            item = self._get(raw_q)
+            if item is _DONE:
+                break
+            period, html = item
+            if not self._acquire(slots):
+                self._drop(period)
+                break
+            future = executor.submit(_parse_in_worker, html, bool(period[1]))
+            # Futures are queued in submission order; the writer waits on each.
+            parsed_q.put((period, future))
+        parsed_q.put(_DONE)
+
+    def _acquire(self, slots: threading.BoundedSemaphore) -> bool:
+        """Waits for a free in-flight slot. Returns False if the pipeline is cancelled."""
+        while not slots.acquire(timeout=_POLL_SECONDS):
+            if self._cancel.is_set():
+                return False
+        return True
+
+    def _sink_loop(self, parsed_q: queue.Queue, slots: threading.BoundedSemaphore) -> None:
+        """Write stage: hands every parsed report to the sinks."""
+        parse_stage, sink_stage = self._metrics.parse, self._metrics.sink
+        while True:
+            item = parsed_q.get()
+            if item is _DONE:
+                return
+            period, future = item
+            try:
+                if self._cancel.is_set() and future.cancel():
+                    self._drop(period)
+                    continue
+                try:
+                    report, parse_seconds = future.result()
+                except Exception as e:
+                    self._fail(parse_stage, period, e)
+                    continue
+                with self._lock:
+                    parse_stage.processed += 1
+                    parse_stage.busy_seconds += parse_seconds
+
+                if isinstance(report, MonthlyReport):
+                    # Reports parsed in another process lose the service reference.
+                    for invoice in report.invoices:
+                        invoice._sii_service = self._sii_service
+
+                started = time.perf_counter()
+                try:
+                    for sink in self._sinks:
+                        sink.write(report)
+                except Exception as e:
+                    self._fail(sink_stage, period, e)
+                    continue
+                with self._lock:
+                    sink_stage.processed += 1
+                    sink_stage.busy_seconds += time.perf_counter() - started
+            finally:
+                slots.release()
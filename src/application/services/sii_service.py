@@ -1,38 +1,412 @@
-
 from __future__ import annotations
-from typing import TYPE_CHECKING
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
 
-from domain.exceptions import AuthError
+from application.ports.response_archive_port import ArchiveMode, ArchivedResponse
+from application.services.circuit_breaker import CircuitBreakerRegistry
+from application.services.latency_tracker import LatencyPolicy, LatencyStats, LatencyTracker
+from domain.exceptions import (
+    ArchiveMissError, AuthError, CircuitOpenError, SessionExpiredError, SiiUnavailableError,
+)
 
 if TYPE_CHECKING:
-    import requests
     from application.ports.auth_port import AuthenticationPort
+    from application.ports.response_archive_port import ResponseArchivePort
     from domain.models import Credentials
 
+# Markers of the SII login page, which is served instead of the requested
+# page once the session has expired.
+_LOGIN_MARKERS = ("IngresoRutClave", "InicioAutenticacion", "CAutInicio")
+
+
+def _is_outage(error: BaseException) -> bool:
+    """Returns True if the error means the SII host is down, not that the request was wrong."""
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code >= 500
+    return isinstance(error, (requests.ConnectionError, requests.Timeout, requests.exceptions.RetryError))
+
+
+def _close_response(future: Future) -> None:
+    """Releases the connection of a response that lost a hedged race."""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+class _RequestThreads:
+    """
+    Pool of reusable threads that never queues work.
+
+    A task goes to an idle thread if there is one and to a new thread
+    otherwise, so a request never waits behind others. Threads stay alive
+    for `idle_seconds` after their last task, which lets them keep their
+    per-thread sessions (and open connections) across requests.
+    """
+
+    def __init__(self, idle_seconds: float = 60.0):
+        self._idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self._tasks: queue.SimpleQueue = queue.SimpleQueue()
+        self._idle = 0
+        self._closed = False
+
+    def submit(self, fn: Callable, *args: Any) -> Future:
+        """Runs `fn(*args)` on an idle or new thread."""
+        future: Future = Future()
+        task = (future, fn, args)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("cannot submit to a closed pool")
+            if self._idle:
+                self._idle -= 1
+                self._tasks.put(task)
+                return future
+        threading.Thread(target=self._work, args=(task,), name="sii-request", daemon=True).start()
+        return future
+
+    def shutdown(self) -> None:
+        """Stops the idle threads; busy ones stop after their current task."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, 0
+        for _ in range(idle):
+            self._tasks.put(None)
+
+    def _work(self, task: Optional[tuple]) -> None:
+        while task is not None:
+            future, fn, args = task
+            if future.set_running_or_notify_cancel():
+                try:
+                    result, error = fn(*args), None
+                except BaseException as e:
+                    result, error = None, e
+                with self._lock:
+                    closed = self._closed
+                    # Counted as idle before the caller wakes up, so its next
+                    # request reuses this thread instead of starting another.
+                    if not closed:
+                        self._idle += 1
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+                if closed:
+                    return
+            task = self._next_task()
+
+    def _next_task(self) -> Optional[tuple]:
+        """Waits for a task. Returns None once the thread should exit."""
+        while True:
+            try:
+                return self._tasks.get(timeout=self._idle_seconds)
+            except queue.Empty:
+                with self._lock:
+                    if self._tasks.empty():
+                        self._idle -= 1
+                        return None
+
 
 class SiiService:
     """Application service to orchestrate operations with the SII."""
 
-    def __init__(self, auth_adapter: AuthenticationPort, session: requests.Session, creds: Credentials):
+    HOME_URL: str = "https://misiir.sii.cl/cgi_misii/siihome.cgi"
+
+    def __init__(
+        self,
+        auth_adapter: AuthenticationPort,
+        session: requests.Session,
+        creds: Credentials,
+        archive: Optional[ResponseArchivePort] = None,
+        archive_mode: ArchiveMode = ArchiveMode.LIVE,
+        latency_policy: Optional[LatencyPolicy] = None,
+        circuit_breakers: Optional[CircuitBreakerRegistry] = None,
+    ):
+        if archive_mode is not ArchiveMode.LIVE and archive is None:
+            raise ValueError(f"An archive is required in {archive_mode.value} mode.")
         self._auth_adapter = auth_adapter
         self._session = session
         self._creds = creds
+        self._archive = archive
+        self._archive_mode = archive_mode
+        self._login_lock = threading.Lock()
+        self._login_generation = 0
+        self._keep_alive_stop: Optional[threading.Event] = None
+        self._keep_alive_thread: Optional[threading.Thread] = None
+        self._latency = LatencyTracker(latency_policy or LatencyPolicy())
+        self._request_threads: Optional[_RequestThreads] = None
+        self._hedge_executor: Optional[ThreadPoolExecutor] = None
+        self._hedge_executor_lock = threading.Lock()
+        self._hedge_slots = threading.BoundedSemaphore(self._latency.policy.max_hedges_in_flight)
+        self._circuit_breakers = circuit_breakers or CircuitBreakerRegistry()
 
     def login(self) -> None:
-        """Performs login using the authentication adapter."""
-        self._auth_adapter.login(self._session)
+        """Performs login using the authentication adapter. Skipped in replay mode."""
+        if self._archive_mode is ArchiveMode.REPLAY:
+            return
+        with self._login_lock:
+            self._auth_adapter.login(self._session)
+            self._login_generation += 1
+
+    def _relogin(self, observed_generation: int) -> None:
+        """
+        Logs in again after an expired session was observed.
+
+        Threads that saw the same expired session share a single login: only
+        the first one to take the lock logs in, the others find the
+        generation already advanced and just replay their request.
+        """
+        with self._login_lock:
+            if self._login_generation != observed_generation:
+                return
+            self._auth_adapter.login(self._session)
+            self._login_generation += 1
+
+    def _is_session_expired(self, resp: requests.Response) -> bool:
+        """Returns True if the response is the login page instead of the requested one."""
+        url = str(resp.url or "")
+        text = resp.text or ""
+        return any(m in url or m in text for m in _LOGIN_MARKERS)
+
+    def _get(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        timeout: float,
+        error_message: str,
+        expect_pdf: bool = False,
+        archive_as: Optional[Tuple[str, str]] = None,
+    ) -> requests.Response:
+        """
+        Performs a GET according to the archive mode.
+
+        `archive_as` is the (kind, name) under which the response is stored
+        in record mode, and served from in replay mode.
+        """
+        if self._archive_mode is ArchiveMode.REPLAY:
+            return self._replay(archive_as, error_message)
+
+        resp = self._get_live(url, params, timeout, error_message, expect_pdf)
+        if self._archive_mode is ArchiveMode.RECORD and archive_as:
+            kind, name = archive_as
+            self._archive.save(self._creds.rut_num, kind, name, ArchivedResponse(
+                content=resp.content,
+                content_type=resp.headers.get('Content-Type', ''),
+                encoding=resp.encoding,
+                url=resp.url,
+                params=dict(params or {}),
+                fetched_at=time.time(),
+            ))
+        return resp
+
+    def _replay(self, archive_as: Optional[Tuple[str, str]], error_message: str) -> requests.Response:
+        """Builds a response from the archive instead of hitting the SII."""
+        archived = self._archive.load(self._creds.rut_num, *archive_as) if archive_as else None
+        if archived is None:
+            raise ArchiveMissError(f"{error_message}: no archived response for {archive_as}.")
+        resp = requests.Response()
+        resp.status_code = 200
+        resp._content = archived.content
+        resp.encoding = archived.encoding
+        resp.url = archived.url
+        resp.headers['Content-Type'] = archived.content_type
+        return resp
+
+    def _get_live(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        timeout: float,
+        error_message: str,
+        expect_pdf: bool,
+    ) -> requests.Response:
+        """
+        Performs the GET against the SII, renewing an expired session once.
+
+        Only the login page counts as an expired session. Any other non-PDF
+        answer to a PDF download, e.g. an error page for an unknown barcode,
+        raises AuthError without logging in again.
+        Raises SiiUnavailableError when the host is down, and fails fast with
+        CircuitOpenError while the host's circuit is open.
+        """
+        host = urlparse(url).hostname or url
+        breaker = self._circuit_breakers.get(host)
+        for attempt in range(2):
+            if not breaker.allow():
+                raise CircuitOpenError(f"{error_message}: {host} is unavailable, try again later.")
+            generation = self._login_generation
+            try:
+                resp = self._send(url, params, timeout)
+            except Exception as e:
+                if _is_outage(e):
+                    breaker.record_failure()
+                    raise SiiUnavailableError(f"{error_message}: {e}") from e
+                breaker.record_success()
+                raise AuthError(f"{error_message}: {e}") from e
+            breaker.record_success()
+
+            is_pdf = 'application/pdf' in resp.headers.get('Content-Type', '')
+            if expect_pdf and is_pdf:
+                return resp
+            if not self._is_session_expired(resp):
+                if expect_pdf:
+                    raise AuthError(f"{error_message}: The response is not a PDF.")
+                return resp
+            if attempt == 0:
+                self._relogin(generation)
+
+        raise SessionExpiredError(f"{error_message}: The session expired and could not be renewed.")
+
+    def _send(self, url: str, params: Optional[Dict[str, Any]], default_timeout: float) -> requests.Response:
+        """
+        Sends a GET with a timeout derived from the endpoint's observed latency.
+
+        If hedging is enabled and the request is still pending after the
+        endpoint's usual (p95) latency, a duplicate is issued while the hedge
+        budget allows it, and the first successful response wins. The delay
+        is counted from the moment a thread starts the GET, connection setup
+        included, which is the same span the recorded latencies measure.
+        """
+        timeout = self._latency.timeout_for(url, default_timeout)
+        self._latency.record_request()
+        delay = self._latency.hedge_delay(url)
+        if delay is None:
+            return self._timed_get(url, params, timeout)
+
+        # The primary runs on a reused thread that never queues behind other
+        # requests; the caller only waits for whichever response comes first.
+        sent = threading.Event()
+        try:
+            primary = self._get_request_threads().submit(self._timed_get, url, params, timeout, sent)
+        except RuntimeError:
+            # The service is closing.
+            return self._timed_get(url, params, timeout)
+        sent.wait()
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        hedge = self._submit_hedge(url, params, timeout)
+        if hedge is None:
+            return primary.result()
+
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.cancelled():
+                    continue
+                if future.exception() is None:
+                    if future is hedge:
+                        self._latency.record_hedge_win()
+                    for other in (primary, hedge):
+                        if other is not future:
+                            other.add_done_callback(_close_response)
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def _submit_hedge(self, url: str, params: Optional[Dict[str, Any]], timeout: float) -> Optional[Future]:
+        """
+        Issues the duplicate of a slow request on the hedge pool. Returns None,
+        without waiting, if the pool is busy or the hedge budget is spent.
+        """
+        if not self._hedge_slots.acquire(blocking=False):
+            return None
+        if not self._latency.try_acquire_hedge():
+            self._hedge_slots.release()
+            return None
+        hedge: Future = Future()
+
+        def run() -> None:
+            try:
+                self._run_request(hedge, url, params, timeout)
+            finally:
+                self._hedge_slots.release()
+
+        def on_cancelled(task: Future) -> None:
+            # The pool was shut down before the hedge could start.
+            if task.cancelled():
+                hedge.cancel()
+                self._hedge_slots.release()
+
+        try:
+            self._get_hedge_executor().submit(run).add_done_callback(on_cancelled)
+        except RuntimeError:
+            # The service is closing.
+            self._hedge_slots.release()
+            return None
+        return hedge
+
+    def _run_request(self, future: Future, url: str, params: Optional[Dict[str, Any]], timeout: float) -> None:
+        """Performs a GET and stores its outcome in `future`."""
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(self._timed_get(url, params, timeout))
+        except BaseException as e:
+            future.set_exception(e)
+
+    def _timed_get(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        timeout: float,
+        sent: Optional[threading.Event] = None,
+    ) -> requests.Response:
+        """
+        Performs a single GET and records its latency if it succeeds.
+        `sent` is set when the GET starts, at the same instant as its timer.
+        """
+        started = time.perf_counter()
+        if sent is not None:
+            sent.set()
+        resp = self._session.get(url, params=params, timeout=timeout)
+        resp.raise_for_status()
+        self._latency.observe(url, time.perf_counter() - started)
+        return resp
+
+    def _get_request_threads(self) -> _RequestThreads:
+        with self._hedge_executor_lock:
+            if self._request_threads is None:
+                self._request_threads = _RequestThreads()
+            return self._request_threads
+
+    def _get_hedge_executor(self) -> ThreadPoolExecutor:
+        with self._hedge_executor_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(
+                    max_workers=self._latency.policy.max_hedges_in_flight,
+                    thread_name_prefix="sii-hedge",
+                )
+            return self._hedge_executor
+
+    def close(self) -> None:
+        """Stops the keep-alive thread and shuts down the request and hedge pools."""
+        self.stop_keep_alive()
+        with self._hedge_executor_lock:
+            threads, self._request_threads = self._request_threads, None
+            executor, self._hedge_executor = self._hedge_executor, None
+        if threads is not None:
+            threads.shutdown()
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def latency_stats(self) -> LatencyStats:
+        """Returns the request and hedge counters."""
+        return self._latency.stats()
 
     def get_home_html(self) -> str:
         """Gets the HTML of the Mi SII home page. Requires prior login."""
         if not self._session:
             raise AuthError("Login is required to get the home page.")
 
-        try:
-            resp = self._session.get("https://misiir.sii.cl/cgi_misii/siihome.cgi", timeout=15)
-            resp.raise_for_status()
-            return resp.text
-        except Exception as e:
-            raise AuthError(f"Error getting home HTML: {e}") from e
+        return self._get(self.HOME_URL, None, 15, "Error getting home HTML").text
 
     def get_annual_report_html(self, year: int) -> str:
         """Gets the annual report of issued fee invoices."""
@@ -46,12 +420,10 @@ class SiiService:
             "cbanoinformeanual": year,
         }
 
-        try:
-            resp = self._session.get(url, params=params, timeout=15)
-            resp.raise_for_status()
-            return resp.text
-        except Exception as e:
-            raise AuthError(f"Error getting the annual report: {e}") from e
+        return self._get(
+            url, params, 15, "Error getting the annual report",
+            archive_as=("annual", str(year)),
+        ).text
 
     def get_monthly_report_html(self, year: int, month: int) -> str:
         """Gets the monthly report of issued fee invoices."""
@@ -67,12 +439,10 @@ class SiiService:
             "rut_arrastre": self._creds.rut_num,
         }
 
-        try:
-            resp = self._session.get(url, params=params, timeout=15)
-            resp.raise_for_status()
-            return resp.text
-        except Exception as e:
-            raise AuthError(f"Error getting the monthly report: {e}") from e
+        return self._get(
+            url, params, 15, "Error getting the monthly report",
+            archive_as=("monthly", f"{year}-{month:02d}"),
+        ).text
 
     def download_invoice_pdf(self, barcode: str) -> bytes:
         """Downloads the PDF of a specific invoice."""
@@ -87,11 +457,38 @@ class SiiService:
             "enviar": "si",
         }
 
-        try:
-            resp = self._session.get(url, params=params, timeout=20)
-            resp.raise_for_status()
-            if 'application/pdf' not in resp.headers.get('Content-Type', ''):
-                raise AuthError("The response is not a PDF. The session may have expired.")
-            return resp.content
-        except Exception as e:
-            raise AuthError(f"Error downloading the invoice PDF: {e}") from e
+        return self._get(
+            url, params, 20, "Error downloading the invoice PDF",
+            expect_pdf=True, archive_as=("pdf", barcode),
+        ).content
+
+    def start_keep_alive(self, interval_seconds: float = 600.0) -> None:
+        """
+        Starts a background thread that visits the home page every
+        `interval_seconds`, renewing the session if it has expired.
+        """
+        if self._archive_mode is ArchiveMode.REPLAY:
+            return
+        if self._keep_alive_thread and self._keep_alive_thread.is_alive():
+            return
+        stop = threading.Event()
+
+        def run() -> None:
+            while not stop.wait(interval_seconds):
+                try:
+                    self.get_home_html()
+                except AuthError:
+                    pass  # Not fatal, the next request will retry the login
+
+        self._keep_alive_stop = stop
+        self._keep_alive_thread = threading.Thread(target=run, name="sii-keep-alive", daemon=True)
+        self._keep_alive_thread.start()
+
+    def stop_keep_alive(self) -> None:
+        """Stops the keep-alive thread, if running."""
+        if self._keep_alive_stop:
+            self._keep_alive_stop.set()
+        if self._keep_alive_thread:
+            self._keep_alive_thread.join()
+        self._keep_alive_stop = None
+        self._keep_alive_thread = None
@@ -0,0 +1,277 @@
+from __future__ import annotations
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Iterable, List, Optional, Set, Tuple, Union
+
+from application.ports.report_sink_port import ReportSink
+
+if TYPE_CHECKING:
+    from bh import BH
+    from domain.models import InvoiceDetail, MonthlyReport
+
+
+@dataclass
+class BackfillPlan:
+    """Work needed to backfill a set of years."""
+    years: List[int]
+    pdf_dir: Optional[str] = None
+    months: List[Tuple[int, int]] = field(default_factory=list)
+    estimated_pdfs: int = 0
+    estimated_requests: int = 0
+    estimated_seconds: float = 0.0
+
+
+@dataclass
+class BackfillProgress:
+    """Progress of a running or finished backfill."""
+    completed: int = 0
+    total: int = 0
+    requests: int = 0
+    elapsed_seconds: float = 0.0
+    throughput: float = 0.0
+    eta_seconds: Optional[float] = None
+    finished: bool = False
+
+
+class BackfillCheckpoint:
+    """
+    Durable record of a backfill's plan and completed work, stored as JSON.
+
+    Every save writes a temporary file, fsyncs it and atomically replaces the
+    previous checkpoint, so a crash leaves either the old or the new state.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike]):
+        self._path = Path(path)
+        self.plan: Optional[BackfillPlan] = None
+        self.completed: Set[str] = set()
+
+    def load(self) -> bool:
+        """Loads the checkpoint from disk. Returns False if it does not exist."""
+        try:
+            data = json.loads(self._path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return False
+        plan = data["plan"]
+        plan["months"] = [tuple(m) for m in plan["months"]]
+        self.plan = BackfillPlan(**plan)
+        self.completed = set(data["completed"])
+        return True
+
+    def save(self) -> None:
+        """Writes the checkpoint to disk atomically."""
+        data = {"plan": asdict(self.plan), "completed": sorted(self.completed)}
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self._path.parent, prefix=f".{self._path.name}.")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self._path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+class BackfillJob:
+    """
+    Checkpointed, resumable backfill of several years of reports and PDFs.
+
+    `plan()` reads the annual reports to estimate the work. `run()` then
+    fetches each month with issued invoices and, if `pdf_dir` is given,
+    every invoice PDF, throttled to `requests_per_minute`. Progress is
+    persisted after each month and each PDF; running the job again with
+    the same checkpoint, years and `pdf_dir` resumes where it left off.
+    """
+
+    def __init__(
+        self,
+        bh: BH,
+        years: Iterable[int],
+        checkpoint_path: Union[str, os.PathLike],
+        sinks: Iterable[ReportSink] = (),
+        pdf_dir: Optional[Union[str, os.PathLike]] = None,
+        requests_per_minute: float = 60.0,
+        max_requests: Optional[int] = None,
+        seconds_per_request: float = 1.0,
+        on_progress: Optional[Callable[[BackfillProgress], None]] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        Args:
+            bh: Logged-in facade of the taxpayer.
+            years: Years to backfill.
+            checkpoint_path: File where progress is persisted.
+            sinks: Destinations of the monthly reports. They stay owned by the
+                caller: the job never closes them, so they can be reused when
+                the job is run again or resumed.
+            pdf_dir: (Optional) Folder to save invoice PDFs to. PDFs are
+                skipped if omitted.
+            requests_per_minute: Maximum request rate towards the SII.
+            max_requests: (Optional) Requests allowed per run. The job stops
+                when the budget is spent and can be resumed later.
+            seconds_per_request: Expected SII latency, used for estimates.
+            on_progress: (Optional) Called with the progress after each unit.
+        """
+        self._bh = bh
+        self._years = sorted(set(years))
+        self._checkpoint = BackfillCheckpoint(checkpoint_path)
+        self._sinks = list(sinks)
+        self._pdf_dir = Path(pdf_dir) if pdf_dir is not None else None
+        self._interval = 60.0 / requests_per_minute
+        self._max_requests = max_requests
+        self._seconds_per_request = seconds_per_request
+        self._on_progress = on_progress
+        self._clock = clock
+        self._sleep = sleep
+        self._cancel = threading.Event()
+        self._next_request_at = 0.0
+        self._requests = 0
+        self._done_this_run = 0
+        self._started_at: Optional[float] = None
+        self._finished = False
+
+    def plan(self) -> BackfillPlan:
+        """
+        Returns the backfill plan, from the checkpoint if one exists or
+        by reading the annual reports otherwise.
+
+        Raises:
+            ValueError: If the checkpoint was planned for other years or
+                another `pdf_dir` than this job's.
+        """
+        pdf_dir = str(self._pdf_dir) if self._pdf_dir is not None else None
+        if self._checkpoint.plan is None and self._checkpoint.load():
+            saved = self._checkpoint.plan
+            if saved.years != self._years or saved.pdf_dir != pdf_dir:
+                raise ValueError(
+                    f"Checkpoint was planned for years={saved.years}, pdf_dir={saved.pdf_dir!r}, "
+                    f"not years={self._years}, pdf_dir={pdf_dir!r}. Use another checkpoint path."
+                )
+        if self._checkpoint.plan is None:
+            plan = BackfillPlan(years=self._years, pdf_dir=pdf_dir)
+            for year in self._years:
+                annual = self._request(lambda: self._bh.get_issued_invoices(year))
+                for number, summary in enumerate(annual.months, start=1):
+                    invoices = summary.issued_count + summary.voided_count
+                    if invoices:
+                        plan.months.append((year, number))
+                        plan.estimated_pdfs += invoices if self._pdf_dir else 0
+            plan.estimated_requests = len(plan.months) + plan.estimated_pdfs
+            plan.estimated_seconds = plan.estimated_requests * max(self._interval, self._seconds_per_request)
+            self._checkpoint.plan = plan
+            self._checkpoint.save()
+        return self._checkpoint.plan
+
+    def cancel(self) -> None:
+        """Stops the job after the unit in progress; it can be resumed later."""
+        self._cancel.set()
+
+    def progress(self) -> BackfillProgress:
+        """Returns the current progress with throughput and ETA."""
+        plan = self._checkpoint.plan
+        total = (len(plan.months) + plan.estimated_pdfs) if plan else 0
+        # "pdfs:" keys only mark that a month needs no further work.
+        completed = sum(1 for k in self._checkpoint.completed if not k.startswith("pdfs:"))
+        total = max(total, completed)
+        elapsed = self._clock() - self._started_at if self._started_at is not None else 0.0
+        throughput = self._done_this_run / elapsed if elapsed > 0 else 0.0
+        remaining = 0 if self._finished else max(0, total - completed)
+        if throughput:
+            eta = remaining / throughput
+        else:
+            eta = remaining * max(self._interval, self._seconds_per_request)
+        return BackfillProgress(
+            completed=completed,
+            total=total,
+            requests=self._requests,
+            elapsed_seconds=elapsed,
+            throughput=throughput,
+            eta_seconds=eta,
+            finished=self._finished,
+        )
+
+    def run(self) -> BackfillProgress:
+        """
+        Runs or resumes the backfill until done, cancelled or out of budget.
+
+        Returns:
+            The final BackfillProgress.
+        """
+        self._cancel.clear()
+        self._started_at = self._clock()
+        self._done_this_run = 0
+        self._finished = False
+        self._finished = not self._run_plan(self.plan())
+        return self.progress()
+
+    def _run_plan(self, plan: BackfillPlan) -> bool:
+        """Works through the plan. Returns True if it stopped before the end."""
+        completed = self._checkpoint.completed
+        stopped = False
+
+        for year, month in plan.months:
+            month_key = f"month:{year}-{month:02d}"
+            pdfs_key = f"pdfs:{year}-{month:02d}"
+            if month_key in completed and (self._pdf_dir is None or pdfs_key in completed):
+                continue
+            if not self._can_continue():
+                stopped = True
+                break
+            report: MonthlyReport = self._request(lambda: self._bh.get_issued_invoices(year, month))
+            if month_key not in completed:
+                for sink in self._sinks:
+                    sink.write(report)
+                self._complete(month_key)
+
+            if self._pdf_dir is not None:
+                for invoice in report.invoices:
+                    pdf_key = f"pdf:{invoice.barcode}"
+                    if pdf_key in completed:
+                        continue
+                    if not self._can_continue():
+                        stopped = True
+                        break
+                    self._save_pdf(year, month, invoice)
+                    self._complete(pdf_key)
+                if stopped:
+                    break
+                completed.add(pdfs_key)
+                self._checkpoint.save()
+
+        return stopped
+
+    def _can_continue(self) -> bool:
+        if self._cancel.is_set():
+            return False
+        return self._max_requests is None or self._requests < self._max_requests
+
+    def _request(self, call: Callable):
+        """Runs a SII request, waiting as needed to respect the request rate."""
+        wait = self._next_request_at - self._clock()
+        if wait > 0:
+            self._sleep(wait)
+        self._next_request_at = max(self._clock(), self._next_request_at) + self._interval
+        self._requests += 1
+        return call()
+
+    def _save_pdf(self, year: int, month: int, invoice: InvoiceDetail) -> None:
+        pdf = self._request(invoice.get_pdf)
+        folder = self._pdf_dir / str(year) / f"{month:02d}"
+        folder.mkdir(parents=True, exist_ok=True)
+        pdf.save(str(folder / f"{invoice.number}_{invoice.barcode}.pdf"))
+
+    def _complete(self, key: str) -> None:
+        """Marks a unit as done and persists the checkpoint."""
+        self._checkpoint.completed.add(key)
+        self._checkpoint.save()
+        self._done_this_run += 1
+        if self._on_progress:
+            self._on_progress(self.progress())
@@ -1,37 +1,93 @@
 
-from typing import Optional, Union
+import dataclasses
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional, Union
 import requests
+from adapters.sii_api.session import ThreadSafeSession
 from adapters.sii_api.client import SiiPasswordAuthAdapter
 from adapters.sii_api.utils import build_session_with_retries
 from application.services.js_parsing_service import JsParsingService
+from application.ports.report_sink_port import ReportSink
+from application.ports.response_archive_port import ArchiveMode, ResponseArchivePort
+from application.services.circuit_breaker import CircuitBreakerRegistry
+from application.services.latency_tracker import LatencyPolicy
 from application.services.parsing_service import ParsingService
+from application.services.report_pipeline import ReportPipeline
+from application.services.report_cache import CacheStats, ReportCache
 from application.services.sii_service import SiiService
+from domain.exceptions import SiiUnavailableError
 from domain.models import Credentials, AnnualReport, MonthlyReport
 
 class BH:
-    """Facade to interact with the SII Fee Invoices services."""
+    """
+    Facade to interact with the SII Fee Invoices services.
 
-    def __init__(self, rut: str, password: str, session: Optional[requests.Session] = None):
+    A BH instance is thread-safe and is meant to be shared by the worker
+    threads serving one taxpayer: each thread gets its own HTTP session, all
+    of them share the authenticated cookies, and re-logins are serialized.
+    A custom `session` passed to the constructor must provide the same
+    guarantees for this to hold.
+    """
+
+    def __init__(
+        self,
+        rut: str,
+        password: str,
+        session: Optional[requests.Session] = None,
+        cache: Optional[ReportCache] = None,
+        keep_alive_interval: Optional[float] = None,
+        archive: Optional[ResponseArchivePort] = None,
+        archive_mode: ArchiveMode = ArchiveMode.LIVE,
+        latency_policy: Optional[LatencyPolicy] = None,
+        circuit_breakers: Optional[CircuitBreakerRegistry] = None,
+        max_stale_reports: int = 64,
+    ):
         """
         Initializes the Facade, performs login, and configures the services.
 
         Args:
             rut: Taxpayer RUT (e.g., "12345678-9").
             password: Tax password.
-            session: (Optional) Requests session to reuse.
+            session: (Optional) Requests session to reuse. Defaults to a
+                ThreadSafeSession with retries.
+            cache: (Optional) Report cache to use. It can be shared between
+                several BH instances; a private one is created if omitted.
+            keep_alive_interval: (Optional) Seconds between background
+                session refreshes. If omitted, no keep-alive thread is started;
+                expired sessions are still renewed on demand.
+            archive: (Optional) Archive of raw SII responses.
+            archive_mode: RECORD stores every report and PDF in `archive`;
+                REPLAY serves them from it without logging in or hitting the SII.
+            latency_policy: (Optional) Adaptive timeouts and request hedging
+                settings. By default timeouts adapt and hedging is off.
+            circuit_breakers: (Optional) Circuit breakers per SII host. It can
+                be shared between several BH instances; a private one is
+                created if omitted.
+            max_stale_reports: Number of last known reports kept for the
+                `allow_stale` fallback; the least recently used are dropped.
         """
         rut_num, dv = self._normalize_rut(rut)
         self._credentials = Credentials(rut_num=rut_num, dv=dv, password=password)
-        self._session = session or build_session_with_retries()
+        self._owns_session = session is None
+        self._session = session or ThreadSafeSession(build_session_with_retries)
+        self._cache = cache or ReportCache()
+        self._last_known: OrderedDict[tuple, Union[AnnualReport, MonthlyReport]] = OrderedDict()
+        self._max_stale_reports = max_stale_reports
+        self._last_known_lock = threading.Lock()
         
         # Service composition
         auth_adapter = SiiPasswordAuthAdapter(creds=self._credentials)
         js_parser = JsParsingService()
         self._parsing_service = ParsingService(js_parser=js_parser)
         self._sii_service = SiiService(
-            auth_adapter=auth_adapter, 
-            session=self._session, 
-            creds=self._credentials
+            auth_adapter=auth_adapter,
+            session=self._session,
+            creds=self._credentials,
+            archive=archive,
+            archive_mode=archive_mode,
+            latency_policy=latency_policy,
+            circuit_breakers=circuit_breakers,
         )
 
         # Inject the service into the parser so models can use it
@@ -39,6 +95,14 @@ class BH:
 
         # Perform login on initialization
         self._sii_service.login()
+        if keep_alive_interval:
+            self._sii_service.start_keep_alive(keep_alive_interval)
+
+    def close(self) -> None:
+        """Stops the background threads of the service and closes the HTTP sessions it created."""
+        self._sii_service.close()
+        if self._owns_session:
+            self._session.close()
 
     def _normalize_rut(self, rut: str) -> tuple[str, str]:
         """Normalizes and validates a RUT string to (number, dv)."""
@@ -50,20 +114,82 @@ class BH:
             raise ValueError("Invalid RUT.")
         return num, dv
 
-    def get_issued_invoices(self, year: int, month: Optional[int] = None) -> Union[AnnualReport, MonthlyReport]:
+    def get_issued_invoices(
+        self,
+        year: int,
+        month: Optional[int] = None,
+        allow_stale: bool = False,
+    ) -> Union[AnnualReport, MonthlyReport]:
         """
         Gets the report of issued invoices, either annual or monthly.
 
         Args:
             year: Year to consult.
             month: (Optional) Month to consult. If omitted, returns the annual report.
+            allow_stale: If True and the SII cannot be reached (outage or open
+                circuit), returns the last report successfully fetched by this
+                instance, with `is_stale` set, instead of raising. Other errors,
+                such as failed logins or expired sessions, are always raised.
 
         Returns:
             AnnualReport if month is None, otherwise MonthlyReport.
         """
+        key = (self._credentials.rut_num, year, month or None)
+        try:
+            return self._cache.get_or_load(key, lambda: self._fetch_report(key, year, month))
+        except SiiUnavailableError:
+            if not allow_stale:
+                raise
+            with self._last_known_lock:
+                report = self._last_known.get(key)
+                if report is not None:
+                    self._last_known.move_to_end(key)
+            if report is None:
+                raise
+            return dataclasses.replace(report, is_stale=True)
+
+    def _fetch_report(self, key: tuple, year: int, month: Optional[int]) -> Union[AnnualReport, MonthlyReport]:
+        """Fetches and parses a report, bypassing the cache."""
         if month:
             html = self._sii_service.get_monthly_report_html(year, month)
-            return self._parsing_service.parse_monthly_report_from_html(html)
+            report = self._parsing_service.parse_monthly_report_from_html(html)
         else:
             html = self._sii_service.get_annual_report_html(year)
-            return self._parsing_service.parse_annual_report_from_html(html)
+            report = self._parsing_service.parse_annual_report_from_html(html)
+        with self._last_known_lock:
+            self._last_known[key] = report
+            self._last_known.move_to_end(key)
+            while len(self._last_known) > self._max_stale_reports:
+                self._last_known.popitem(last=False)
+        return report
+
+    def build_pipeline(self, sinks: Iterable[ReportSink], **options) -> ReportPipeline:
+        """
+        Builds a fetch/parse pipeline for large backfills with this taxpayer's session.
+
+        Args:
+            sinks: Destinations of the parsed reports.
+            **options: Tuning options of ReportPipeline (fetch_workers,
+                parse_workers, queue_size, max_in_flight, executor).
+
+        Returns:
+            A ReportPipeline; call run() with the (year, month) periods to fetch.
+        """
+        return ReportPipeline(self._sii_service, sinks, **options)
+
+    def cache_stats(self) -> CacheStats:
+        """Returns the hit/miss/coalesced counters of the report cache."""
+        return self._cache.stats()
+
+    def invalidate_cache(self, year: Optional[int] = None, month: Optional[int] = None) -> None:
+        """
+        Drops cached reports so the next call fetches them again.
+
+        Args:
+            year: (Optional) Year of the report to drop. If omitted, the whole cache is cleared.
+            month: (Optional) Month of the report to drop. If omitted, drops the annual report.
+        """
+        if year is None:
+            self._cache.invalidate()
+        else:
+            self._cache.invalidate((self._credentials.rut_num, year, month or None))
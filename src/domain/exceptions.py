@@ -1,3 +1,15 @@
 
 class AuthError(Exception):
     """Error de autenticación o sesión."""
+
+class SessionExpiredError(AuthError):
+    """La sesión en el SII expiró y no pudo renovarse."""
+
+class ArchiveMissError(LookupError):
+    """No existe una respuesta archivada para la solicitud."""
+
+class SiiUnavailableError(AuthError):
+    """El SII no responde: error de conexión, timeout o error 5xx."""
+
+class CircuitOpenError(SiiUnavailableError):
+    """El SII no está respondiendo y las solicitudes se rechazan sin intentarlas."""
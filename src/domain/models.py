@@ -48,6 +48,7 @@ class AnnualReport:
     is_professional_partnership: bool
     totals: AnnualTotals
     months: List[MonthlyInvoiceSummary] = field(default_factory=list)
+    is_stale: bool = False
 
 @dataclass
 class PDF:
@@ -103,4 +104,34 @@ class MonthlyReport:
     total_issuer_withholding: int
     total_recipient_withholding: int
     total_net_amount: int
-    invoices: List[InvoiceDetail] = field(default_factory=list)
\ No newline at end of file
+    invoices: List[InvoiceDetail] = field(default_factory=list)
+    is_stale: bool = False
+
+@dataclass
+class Discrepancy:
+    """A single mismatch found while reconciling reports."""
+    rut: str
+    year: int
+    month: int
+    field: str
+    expected: Optional[int]
+    actual: Optional[int]
+
+@dataclass
+class ReconciliationReport:
+    """Result of reconciling monthly details against annual totals."""
+    checked_months: int = 0
+    checked_invoices: int = 0
+    discrepancies: List[Discrepancy] = field(default_factory=list)
+
+    @property
+    def is_consistent(self) -> bool:
+        """True when no discrepancies were found."""
+        return not self.discrepancies
+
+    def by_rut(self) -> Dict[str, List[Discrepancy]]:
+        """Groups the discrepancies by taxpayer RUT."""
+        grouped: Dict[str, List[Discrepancy]] = {}
+        for d in self.discrepancies:
+            grouped.setdefault(d.rut, []).append(d)
+        return grouped
@@ -0,0 +1,92 @@
+import pytest
+from unittest.mock import MagicMock
+from src.backfill import BackfillJob
+from src.domain.models import (
+    AnnualReport, AnnualTotals, InvoiceDetail, MonthlyInvoiceSummary, MonthlyReport, PDF
+)
+
+def make_invoice(number):
+    invoice = InvoiceDetail(
+        number=number, issuer="Test User", issue_date="01/01/2024", recipient_rut="98765432-1",
+        recipient_name="Test Recipient", total_fee=1000, issuer_withholding=100,
+        recipient_withholding=0, net_amount=900, status="N", barcode=f"BC{number}",
+    )
+    invoice.get_pdf = MagicMock(return_value=PDF(b"%PDF"))
+    return invoice
+
+@pytest.fixture
+def bh():
+    """Pytest fixture for a mocked BH with invoices in January and March."""
+    months = [MonthlyInvoiceSummary(month=str(m), issued_count=1 if m in (1, 3) else 0) for m in range(1, 13)]
+    annual = AnnualReport(
+        taxpayer_name="Test User", rut="12345678-9", year=2024,
+        is_professional_partnership=False, totals=AnnualTotals(), months=months,
+    )
+
+    def get_issued_invoices(year, month=None):
+        if month is None:
+            return annual
+        return MonthlyReport(
+            taxpayer_name="Test User", rut="12345678-9", year=year, month=month,
+            total_invoices=1, total_fees=1000, total_issuer_withholding=100,
+            total_recipient_withholding=0, total_net_amount=900, invoices=[make_invoice(month)],
+        )
+
+    mock = MagicMock()
+    mock.get_issued_invoices.side_effect = get_issued_invoices
+    return mock
+
+
+def test_plan_estimates_work(bh, tmp_path):
+    """Tests that the plan covers the months with invoices and their PDFs."""
+    job = BackfillJob(bh, [2024], tmp_path / "job.json", pdf_dir=tmp_path / "pdfs", requests_per_minute=30)
+
+    plan = job.plan()
+
+    assert plan.months == [(2024, 1), (2024, 3)]
+    assert plan.estimated_pdfs == 2
+    assert plan.estimated_requests == 4
+    assert plan.estimated_seconds == 8.0
+
+def test_run_resumes_from_checkpoint(bh, tmp_path):
+    """Tests that a job stopped by its request budget resumes without redoing work."""
+    sink = MagicMock()
+    options = dict(sinks=[sink], pdf_dir=tmp_path / "pdfs", requests_per_minute=6000, sleep=lambda s: None)
+
+    first = BackfillJob(bh, [2024], tmp_path / "job.json", max_requests=3, **options).run()
+    assert not first.finished
+    assert first.completed == 2
+
+    second = BackfillJob(bh, [2024], tmp_path / "job.json", **options).run()
+
+    assert second.finished
+    assert second.completed == second.total == 4
+    assert second.eta_seconds == 0
+    assert sink.write.call_count == 2
+    assert (tmp_path / "pdfs" / "2024" / "03" / "3_BC3.pdf").read_bytes() == b"%PDF"
+    assert bh.get_issued_invoices.call_count == 3
+
+def test_resume_with_other_options_is_rejected(bh, tmp_path):
+    """Tests that a checkpoint cannot be resumed with different years or pdf_dir."""
+    BackfillJob(bh, [2024], tmp_path / "job.json").plan()
+
+    with pytest.raises(ValueError):
+        BackfillJob(bh, [2023, 2024], tmp_path / "job.json").plan()
+    with pytest.raises(ValueError):
+        BackfillJob(bh, [2024], tmp_path / "job.json", pdf_dir=tmp_path / "pdfs").plan()
+
+def test_sinks_are_left_open_across_runs(bh, tmp_path):
+    """Tests that sinks are not closed, so a failed job can be run again with them."""
+    sink = MagicMock()
+    job = BackfillJob(bh, [2024], tmp_path / "job.json", sinks=[sink], sleep=lambda s: None)
+    job.plan()
+    get_issued_invoices = bh.get_issued_invoices.side_effect
+    bh.get_issued_invoices.side_effect = RuntimeError("SII is down")
+
+    with pytest.raises(RuntimeError):
+        job.run()
+    bh.get_issued_invoices.side_effect = get_issued_invoices
+
+    assert job.run().finished
+    assert sink.write.call_count == 2
+    sink.close.assert_not_called()
@@ -3,6 +3,7 @@ import pytest
 from unittest.mock import MagicMock, patch
 from src.bh import BH
 from src.domain.models import AnnualReport, MonthlyReport, InvoiceDetail, PDF, AnnualTotals
+from domain.exceptions import CircuitOpenError, SessionExpiredError
 
 @pytest.fixture
 def mock_sii_service():
@@ -59,6 +60,15 @@ def test_bh_facade(
     mock_sii_service_instance.get_monthly_report_html.assert_called_once_with(2025, 1)
     mock_parsing_service_instance.parse_monthly_report_from_html.assert_called_once_with("<html></html>")
 
+    # Repeated calls are served from the report cache
+    assert bh.get_issued_invoices(year=2025, month=1) is monthly_report
+    mock_sii_service_instance.get_monthly_report_html.assert_called_once_with(2025, 1)
+    assert bh.cache_stats().hits == 1
+
+    bh.invalidate_cache(2025, 1)
+    bh.get_issued_invoices(year=2025, month=1)
+    assert mock_sii_service_instance.get_monthly_report_html.call_count == 2
+
     # Test get_pdf on InvoiceDetail
     invoice = InvoiceDetail(
         number=1, issuer="Test User", issue_date="01/01/2025", recipient_rut="98765432-1",
@@ -73,3 +83,80 @@ def test_bh_facade(
     assert isinstance(pdf, PDF)
     assert pdf.get_bytes() == b"pdf_content"
     mock_sii_service_instance.download_invoice_pdf.assert_called_once_with("barcode")
+
+@patch('src.bh.build_session_with_retries')
+@patch('src.bh.SiiPasswordAuthAdapter')
+@patch('src.bh.JsParsingService')
+@patch('src.bh.ParsingService')
+@patch('src.bh.SiiService')
+def test_bh_stale_fallback(
+    MockSiiService, MockParsingService, MockJsParsingService,
+    MockSiiPasswordAuthAdapter, mock_build_session
+):
+    """Tests that the last known report is returned, marked stale, when the SII is down."""
+    bh = BH(rut="12345678-9", password="password")
+    sii_service = MockSiiService.return_value
+    MockParsingService.return_value.parse_annual_report_from_html.return_value = AnnualReport(
+        taxpayer_name="Test User", rut="12345678-9", year=2025,
+        is_professional_partnership=False, totals=AnnualTotals(), months=[]
+    )
+    bh.get_issued_invoices(year=2025)
+    bh.invalidate_cache()
+    sii_service.get_annual_report_html.side_effect = CircuitOpenError("SII is down")
+
+    with pytest.raises(CircuitOpenError):
+        bh.get_issued_invoices(year=2025)
+    with pytest.raises(CircuitOpenError):
+        bh.get_issued_invoices(year=2024, allow_stale=True)
+
+    stale = bh.get_issued_invoices(year=2025, allow_stale=True)
+    assert stale.is_stale
+    assert stale.taxpayer_name == "Test User"
+
+@patch('src.bh.build_session_with_retries')
+@patch('src.bh.SiiPasswordAuthAdapter')
+@patch('src.bh.JsParsingService')
+@patch('src.bh.ParsingService')
+@patch('src.bh.SiiService')
+def test_bh_stale_reports_are_bounded(
+    MockSiiService, MockParsingService, MockJsParsingService,
+    MockSiiPasswordAuthAdapter, mock_build_session
+):
+    """Tests that only the most recently used reports are kept for the stale fallback."""
+    bh = BH(rut="12345678-9", password="password", max_stale_reports=1)
+    sii_service = MockSiiService.return_value
+    MockParsingService.return_value.parse_annual_report_from_html.side_effect = lambda html: AnnualReport(
+        taxpayer_name="Test User", rut="12345678-9", year=2025,
+        is_professional_partnership=False, totals=AnnualTotals(), months=[]
+    )
+    bh.get_issued_invoices(year=2024)
+    bh.get_issued_invoices(year=2025)
+    bh.invalidate_cache()
+    sii_service.get_annual_report_html.side_effect = CircuitOpenError("SII is down")
+
+    assert bh.get_issued_invoices(year=2025, allow_stale=True).is_stale
+    with pytest.raises(CircuitOpenError):
+        bh.get_issued_invoices(year=2024, allow_stale=True)
+
+@patch('src.bh.build_session_with_retries')
+@patch('src.bh.SiiPasswordAuthAdapter')
+@patch('src.bh.JsParsingService')
+@patch('src.bh.ParsingService')
+@patch('src.bh.SiiService')
+def test_bh_stale_fallback_does_not_mask_auth_errors(
+    MockSiiService, MockParsingService, MockJsParsingService,
+    MockSiiPasswordAuthAdapter, mock_build_session
+):
+    """Tests that an expired session is raised even when stale data is allowed."""
+    bh = BH(rut="12345678-9", password="password")
+    sii_service = MockSiiService.return_value
+    MockParsingService.return_value.parse_annual_report_from_html.return_value = AnnualReport(
+        taxpayer_name="Test User", rut="12345678-9", year=2025,
+        is_professional_partnership=False, totals=AnnualTotals(), months=[]
+    )
+    bh.get_issued_invoices(year=2025)
+    bh.invalidate_cache()
+    sii_service.get_annual_report_html.side_effect = SessionExpiredError("The session expired")
+
+    with pytest.raises(SessionExpiredError):
+        bh.get_issued_invoices(year=2025, allow_stale=True)
@@ -0,0 +1,46 @@
+from src.application.services.circuit_breaker import CircuitBreaker, CircuitBreakerRegistry
+
+class FakeClock:
+    """Manually advanced clock for reset timeout tests."""
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_circuit_opens_and_recovers():
+    """Tests the closed -> open -> half-open -> closed cycle."""
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    clock.now = 10
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state.value == "closed"
+    assert breaker.allow()
+
+def test_failed_trial_reopens_circuit():
+    """Tests that a failed half-open trial opens the circuit again."""
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+
+    clock.now = 10
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state.value == "open"
+    assert not breaker.allow()
+
+def test_registry_has_one_breaker_per_host():
+    """Tests that breakers are shared per host."""
+    registry = CircuitBreakerRegistry(failure_threshold=1)
+
+    assert registry.get("loa.sii.cl") is registry.get("loa.sii.cl")
+    assert registry.get("loa.sii.cl") is not registry.get("misiir.sii.cl")
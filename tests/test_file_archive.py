@@ -0,0 +1,19 @@
+from src.adapters.archive.file_archive import FileResponseArchive
+from application.ports.response_archive_port import ArchivedResponse
+
+def test_save_and_load(tmp_path):
+    """Tests that a saved response is loaded back with its metadata."""
+    archive = FileResponseArchive(tmp_path)
+    response = ArchivedResponse(
+        content=b"%PDF-1.4", content_type="application/pdf", url="https://loa.sii.cl/x",
+        params={"txt_codigobarras": "ABC.1"}, fetched_at=1.5,
+    )
+
+    archive.save("12345678", "pdf", "ABC.1", response)
+
+    assert archive.load("12345678", "pdf", "ABC.1") == response
+    assert (tmp_path / "12345678" / "pdf" / "ABC.1.gz").exists()
+
+def test_load_missing(tmp_path):
+    """Tests that a missing entry returns None."""
+    assert FileResponseArchive(tmp_path).load("12345678", "annual", "2025") is None
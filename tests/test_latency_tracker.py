@@ -0,0 +1,37 @@
+from src.application.services.latency_tracker import LatencyPolicy, LatencyTracker
+
+def test_timeout_adapts_within_bounds():
+    """Tests that timeouts follow the observed p99 and stay within bounds."""
+    tracker = LatencyTracker(LatencyPolicy(min_samples=5, min_timeout=1.0, timeout_multiplier=3.0))
+
+    assert tracker.timeout_for("annual", 15) == 15
+    for _ in range(5):
+        tracker.observe("annual", 2.0)
+    assert tracker.timeout_for("annual", 15) == 6.0
+    assert tracker.timeout_for("annual", 4) == 4
+    assert tracker.timeout_for("pdf", 20) == 20
+
+def test_hedge_delay_and_budget():
+    """Tests that hedging waits for enough samples and respects its budget."""
+    tracker = LatencyTracker(LatencyPolicy(hedging=True, min_samples=2, hedge_budget=0.1))
+
+    assert tracker.hedge_delay("monthly") is None
+    tracker.observe("monthly", 0.5)
+    tracker.observe("monthly", 1.5)
+    assert tracker.hedge_delay("monthly") == 1.5
+
+    for _ in range(10):
+        tracker.record_request()
+    assert tracker.try_acquire_hedge()
+    assert not tracker.try_acquire_hedge()
+    assert tracker.stats().hedges == 1
+
+def test_hedge_budget_is_capped_after_long_healthy_run():
+    """Tests that unused hedge budget does not pile up beyond the burst size."""
+    tracker = LatencyTracker(LatencyPolicy(hedging=True, hedge_budget=0.05, hedge_burst=3))
+
+    for _ in range(10000):
+        tracker.record_request()
+    hedges = sum(tracker.try_acquire_hedge() for _ in range(100))
+
+    assert hedges == 3
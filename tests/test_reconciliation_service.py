@@ -0,0 +1,53 @@
+import dataclasses
+import pytest
+from src.application.services.js_parsing_service import JsParsingService
+from src.application.services.parsing_service import ParsingService
+from src.application.services.reconciliation_service import ReconciliationService
+
+@pytest.fixture
+def reports():
+    """Pytest fixture providing the annual and monthly reports parsed from the fixtures."""
+    parsing_service = ParsingService(JsParsingService())
+    with open("tests/fixtures/anual.html", "r", encoding="iso-8859-1") as f:
+        annual = parsing_service.parse_annual_report_from_html(f.read())
+    with open("tests/fixtures/mensual.html", "r", encoding="iso-8859-1") as f:
+        monthly = parsing_service.parse_monthly_report_from_html(f.read())
+    return annual, monthly
+
+
+def test_reconcile_consistent_reports(reports):
+    """Tests that the fixture reports reconcile without discrepancies."""
+    annual, monthly = reports
+
+    result = ReconciliationService().reconcile([monthly], [annual])
+
+    assert result.is_consistent
+    assert result.checked_months == 1
+    assert result.checked_invoices == 1
+
+def test_reconcile_reports_discrepancies(reports):
+    """Tests that mismatching totals, counts and folios are reported."""
+    annual, monthly = reports
+    invoice = dataclasses.replace(monthly.invoices[0], number=4, total_fee=1)
+    voided = dataclasses.replace(monthly.invoices[0], number=5, status="A")
+    broken = dataclasses.replace(monthly, total_invoices=2, invoices=[invoice, voided])
+
+    result = ReconciliationService().reconcile([broken], [annual])
+
+    fields = {d.field: (d.expected, d.actual) for d in result.discrepancies}
+    assert fields["total_fees"] == (123244, 123245)
+    assert fields["voided_count"] == (0, 1)
+    assert fields["start_folio"] == (3, 4)
+    assert "issued_count" not in fields
+    assert list(result.by_rut()) == [monthly.rut]
+
+def test_reconcile_voided_invoice_keeps_its_folio(reports):
+    """Tests that a voided first or last invoice still counts for the folio range and amounts."""
+    annual, monthly = reports
+    voided = dataclasses.replace(monthly.invoices[0], status="A", void_date="02/01/2025")
+    summary = dataclasses.replace(annual.months[0], issued_count=0, voided_count=1)
+    annual = dataclasses.replace(annual, months=[summary, *annual.months[1:]])
+
+    result = ReconciliationService().reconcile([dataclasses.replace(monthly, invoices=[voided])], [annual])
+
+    assert result.is_consistent
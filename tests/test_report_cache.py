@@ -0,0 +1,97 @@
+import threading
+import time
+import pytest
+from src.application.services.report_cache import ReportCache
+
+class FakeClock:
+    """Manually advanced clock for TTL tests."""
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_concurrent_callers_share_one_load():
+    """Tests that concurrent callers for the same key are coalesced."""
+    cache = ReportCache()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "report"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.get_or_load("k", loader)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(cache.get_or_load("k", loader))) for _ in range(4)]
+    for t in followers:
+        t.start()
+    while cache.stats().coalesced < 4:
+        time.sleep(0.001)
+    release.set()
+    for t in [leader, *followers]:
+        t.join(5)
+
+    assert results == ["report"] * 5
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert (stats.misses, stats.coalesced, stats.hits) == (1, 4, 0)
+    assert cache.get_or_load("k", loader) == "report"
+    assert cache.stats().hits == 1
+
+def test_entries_expire_and_evict():
+    """Tests TTL expiry and LRU eviction."""
+    clock = FakeClock()
+    cache = ReportCache(max_entries=2, ttl_seconds=10, clock=clock)
+
+    cache.get_or_load("a", lambda: 1)
+    cache.get_or_load("b", lambda: 2)
+    cache.get_or_load("a", lambda: 0)
+    cache.get_or_load("c", lambda: 3)
+
+    assert cache.stats().evictions == 1
+    assert cache.get_or_load("a", lambda: 0) == 1
+    assert cache.get_or_load("b", lambda: 20) == 20
+
+    clock.now = 11
+    assert cache.get_or_load("a", lambda: 10) == 10
+
+def test_failed_load_is_not_cached():
+    """Tests that errors propagate and the next call retries the load."""
+    cache = ReportCache()
+
+    def failing():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_load("k", failing)
+    assert cache.get_or_load("k", lambda: "ok") == "ok"
+    assert cache.stats().size == 1
+
+def test_invalidate_during_load_is_not_overwritten():
+    """Tests that a load in flight when its key is invalidated is not cached."""
+    cache = ReportCache()
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_loader():
+        started.set()
+        release.wait(5)
+        return "old"
+
+    results = []
+    t = threading.Thread(target=lambda: results.append(cache.get_or_load("k", slow_loader)))
+    t.start()
+    started.wait(5)
+    cache.invalidate("k")
+    release.set()
+    t.join(5)
+
+    assert results == ["old"]
+    assert cache.get_or_load("k", lambda: "new") == "new"
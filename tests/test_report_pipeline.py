@@ -0,0 +1,82 @@
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+from src.application.services.report_pipeline import CallbackSink, ReportPipeline
+
+@pytest.fixture
+def sii_service():
+    """Pytest fixture for a mocked SiiService serving the HTML fixtures."""
+    with open("tests/fixtures/anual.html", "r", encoding="iso-8859-1") as f:
+        annual_html = f.read()
+    with open("tests/fixtures/mensual.html", "r", encoding="iso-8859-1") as f:
+        monthly_html = f.read()
+    service = MagicMock()
+    service.get_annual_report_html.return_value = annual_html
+    service.get_monthly_report_html.return_value = monthly_html
+    return service
+
+
+def test_pipeline_parses_in_process_pool(sii_service):
+    """Tests that every period is fetched, parsed in worker processes and written."""
+    reports = []
+    pipeline = ReportPipeline(sii_service, [CallbackSink(reports.append)], fetch_workers=2, parse_workers=2)
+
+    metrics = pipeline.run([(2025, None)] + [(2025, m) for m in range(1, 5)])
+
+    assert len(reports) == 5
+    assert metrics.fetch.processed == metrics.parse.processed == metrics.sink.processed == 5
+    assert not metrics.failures
+    monthly = [r for r in reports if hasattr(r, "invoices")]
+    assert monthly[0].invoices[0]._sii_service is sii_service
+
+def test_pipeline_records_failures(sii_service):
+    """Tests that failed fetches are reported without stopping the pipeline."""
+    def fetch(year, month):
+        if month == 2:
+            raise RuntimeError("SII is down")
+        return "<html></html>"
+
+    sii_service.get_monthly_report_html.side_effect = fetch
+    reports = []
+    pipeline = ReportPipeline(sii_service, [CallbackSink(reports.append)], executor=ThreadPoolExecutor(2))
+
+    metrics = pipeline.run([(2025, 1), (2025, 2)])
+
+    assert {(f.month, f.stage) for f in metrics.failures} == {(1, "parse"), (2, "fetch")}
+    assert reports == []
+
+def test_pipeline_cancel(sii_service):
+    """Tests that cancelling stops a pipeline blocked on backpressure."""
+    pipeline = ReportPipeline(
+        sii_service, [], fetch_workers=1, queue_size=1, max_in_flight=1, executor=ThreadPoolExecutor(1)
+    )
+    release = threading.Event()
+
+    def slow_fetch(year, month):
+        if month == 3:
+            pipeline.cancel()
+        release.wait(0.05)
+        return sii_service.get_annual_report_html.return_value
+
+    sii_service.get_monthly_report_html.side_effect = slow_fetch
+    metrics = pipeline.run((2025, m) for m in range(1, 13))
+
+    assert metrics.cancelled
+    assert metrics.fetch.processed < 12
+    cancelled = [f.month for f in metrics.failures if f.stage == "cancelled"]
+    assert cancelled
+    # Every period is either written or reported, so the run can be resumed.
+    assert metrics.sink.processed + len(metrics.failures) == 12
+    assert len({f.month for f in metrics.failures}) == len(metrics.failures)
+
+def test_pipeline_does_not_close_sinks_and_can_run_again(sii_service):
+    """Tests that sinks are left open, so the same pipeline can run twice."""
+    sink = MagicMock()
+    pipeline = ReportPipeline(sii_service, [sink], executor=ThreadPoolExecutor(2))
+
+    pipeline.run([(2025, 1)])
+    pipeline.run([(2025, 2)])
+
+    assert sink.write.call_count == 2
+    sink.close.assert_not_called()
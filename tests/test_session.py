@@ -0,0 +1,125 @@
+import gc
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+import requests
+from requests.adapters import BaseAdapter
+from src.adapters.sii_api.session import ThreadSafeSession
+from src.application.services.report_cache import ReportCache
+from src.bh import BH
+
+LOGIN_PAGE = b"<html><script>location.href='IngresoRutClave.html'</script></html>"
+
+
+class FakeSii(BaseAdapter):
+    """Transport that serves the fixtures while the session token is valid."""
+
+    def __init__(self, expire_every: int):
+        super().__init__()
+        with open("tests/fixtures/anual.html", "rb") as f:
+            self._annual = f.read()
+        with open("tests/fixtures/mensual.html", "rb") as f:
+            self._monthly = f.read()
+        self._lock = threading.Lock()
+        self._expire_every = expire_every
+        self.token = None
+        self.issued = 0
+        self.requests = 0
+        self.expirations = 0
+
+    def login(self, session):
+        with self._lock:
+            self.issued += 1
+            self.token = f"token-{self.issued}"
+            session.cookies.set("TOKEN", self.token)
+
+    def send(self, request, **kwargs):
+        with self._lock:
+            self.requests += 1
+            if self.requests % self._expire_every == 0 and self.token:
+                self.token = None
+                self.expirations += 1
+            valid = self.token and f"TOKEN={self.token}" in request.headers.get("Cookie", "")
+
+        resp = requests.Response()
+        resp.request = request
+        resp.url = request.url
+        resp.status_code = 200
+        resp.encoding = "iso-8859-1"
+        resp.headers["Content-Type"] = "text/html"
+        if not valid:
+            resp._content = LOGIN_PAGE
+        elif "InformeAnual" in request.url:
+            resp._content = self._annual
+        elif "InformeMensual" in request.url:
+            resp._content = self._monthly
+        else:
+            resp._content = b"%PDF-1.4"
+            resp.headers["Content-Type"] = "application/pdf"
+        return resp
+
+    def close(self):
+        pass
+
+
+@patch('src.bh.SiiPasswordAuthAdapter')
+def test_bh_shared_across_threads(MockSiiPasswordAuthAdapter):
+    """Hammers one BH from many threads while the SII session keeps expiring."""
+    sii = FakeSii(expire_every=97)
+    MockSiiPasswordAuthAdapter.return_value.login.side_effect = sii.login
+    created = []
+
+    def session_factory():
+        session = requests.Session()
+        created.append(session)
+        session.mount("https://", sii)
+        return session
+
+    session = ThreadSafeSession(session_factory)
+    bh = BH(rut="12345678-9", password="password", session=session, cache=ReportCache(ttl_seconds=0))
+
+    def work(i):
+        if i % 3 == 0:
+            return bh.get_issued_invoices(year=2025).totals.issued_count
+        report = bh.get_issued_invoices(year=2025, month=1)
+        return report.invoices[0].get_pdf().get_bytes()
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(work, range(600)))
+
+    assert results == [8 if i % 3 == 0 else b"%PDF-1.4" for i in range(600)]
+    assert sii.expirations > 0
+    assert sii.issued == 1 + sii.expirations
+    assert len(created) > 1
+
+
+class TrackedSession(requests.Session):
+    open_sessions = 0
+    lock = threading.Lock()
+
+    def __init__(self):
+        super().__init__()
+        self.mount("https://", FakeSii(expire_every=10**9))
+        with self.lock:
+            TrackedSession.open_sessions += 1
+
+    def close(self):
+        with self.lock:
+            TrackedSession.open_sessions -= 1
+        super().close()
+
+
+def test_sessions_of_finished_threads_are_closed():
+    """Tests that short-lived threads do not leave their sessions open."""
+    session = ThreadSafeSession(TrackedSession)
+    session.get("https://www4.sii.cl/")
+
+    for _ in range(50):
+        t = threading.Thread(target=session.get, args=("https://www4.sii.cl/",))
+        t.start()
+        t.join()
+    gc.collect()
+
+    assert TrackedSession.open_sessions == 1
+    session.close()
+    assert TrackedSession.open_sessions == 0
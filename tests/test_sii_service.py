@@ -1,8 +1,18 @@
 
+import threading
+import time
 import pytest
+import requests
+from requests.adapters import BaseAdapter
 from unittest.mock import MagicMock
+from src.adapters.sii_api.session import ThreadSafeSession
 from src.application.services.sii_service import SiiService
 from src.domain.models import Credentials
+from src.adapters.archive.file_archive import FileResponseArchive
+from application.ports.response_archive_port import ArchiveMode
+from application.services.circuit_breaker import CircuitBreakerRegistry
+from application.services.latency_tracker import LatencyPolicy
+from domain.exceptions import ArchiveMissError, AuthError, CircuitOpenError
 
 @pytest.fixture
 def mock_session():
@@ -46,3 +56,167 @@ def test_download_invoice_pdf(sii_service: SiiService, mock_session):
 
     assert pdf_content == b"pdf_content"
     mock_session.get.assert_called_once()
+
+def test_expired_session_relogins_and_replays(sii_service: SiiService, mock_session):
+    """Tests that an expired session triggers one re-login and the request is replayed."""
+    expired = MagicMock(url="https://zeusr.sii.cl/AUT2000/InicioAutenticacion/IngresoRutClave.html", text="")
+    valid = MagicMock(url="https://loa.sii.cl/cgi_IMT/TMBCOC_InformeAnualBhe.cgi", text="<html></html>")
+    mock_session.get.side_effect = [expired, valid]
+
+    html = sii_service.get_annual_report_html(2025)
+
+    assert html == "<html></html>"
+    assert mock_session.get.call_count == 2
+    sii_service._auth_adapter.login.assert_called_once_with(mock_session)
+
+def test_expired_session_is_renewed_once_across_threads(sii_service: SiiService, mock_session):
+    """Tests that concurrent callers seeing the same expired session share one re-login."""
+    expired = MagicMock(url="https://zeusr.sii.cl/AUT2000/InicioAutenticacion/IngresoRutClave.html", text="")
+    valid = MagicMock(url="https://loa.sii.cl/cgi_IMT/TMBCOC_InformeAnualBhe.cgi", text="<html></html>")
+    callers = 8
+    barrier = threading.Barrier(callers)
+    logged_in = threading.Event()
+
+    def get(url, params, timeout):
+        if logged_in.is_set():
+            return valid
+        barrier.wait(5)  # every caller has seen the expired session
+        return expired
+
+    def login(session):
+        time.sleep(0.05)
+        logged_in.set()
+
+    mock_session.get.side_effect = get
+    sii_service._auth_adapter.login.side_effect = login
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(sii_service.get_annual_report_html(2025)))
+        for _ in range(callers)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+
+    assert results == ["<html></html>"] * callers
+    sii_service._auth_adapter.login.assert_called_once_with(mock_session)
+
+def test_download_invoice_pdf_session_not_renewed(sii_service: SiiService, mock_session):
+    """Tests that a non-PDF response that is not the login page fails without re-login."""
+    mock_session.get.return_value.headers = {'Content-Type': 'text/html'}
+    mock_session.get.return_value.url = "https://loa.sii.cl/cgi_IMT/TMBCOT_ConsultaBoletaPdf.cgi"
+    mock_session.get.return_value.text = "<html>Boleta no encontrada</html>"
+
+    for _ in range(3):
+        with pytest.raises(AuthError, match="not a PDF"):
+            sii_service.download_invoice_pdf("bad-barcode")
+    assert mock_session.get.call_count == 3
+    sii_service._auth_adapter.login.assert_not_called()
+
+def test_download_invoice_pdf_renews_expired_session(sii_service: SiiService, mock_session):
+    """Tests that the login page served instead of a PDF triggers a re-login."""
+    expired = MagicMock(
+        url="https://zeusr.sii.cl/AUT2000/InicioAutenticacion/IngresoRutClave.html",
+        text="", headers={'Content-Type': 'text/html'},
+    )
+    pdf = MagicMock(content=b"%PDF-1.4", headers={'Content-Type': 'application/pdf'}, text="")
+    mock_session.get.side_effect = [expired, pdf]
+
+    assert sii_service.download_invoice_pdf("barcode") == b"%PDF-1.4"
+    sii_service._auth_adapter.login.assert_called_once_with(mock_session)
+
+def test_record_then_replay(mock_session, tmp_path):
+    """Tests that recorded responses are served in replay mode without hitting the SII."""
+    credentials = Credentials(rut_num="12345678", dv="9", password="password")
+    archive = FileResponseArchive(tmp_path)
+    mock_session.get.return_value = MagicMock(
+        url="https://loa.sii.cl/cgi_IMT/TMBCOC_InformeMensualBhe.cgi",
+        content="<html>ñ</html>".encode("iso-8859-1"), text="<html>ñ</html>",
+        encoding="ISO-8859-1", headers={'Content-Type': 'text/html'},
+    )
+    recorder = SiiService(MagicMock(), mock_session, credentials, archive, ArchiveMode.RECORD)
+    recorder.get_monthly_report_html(2025, 1)
+
+    replay_session = MagicMock()
+    replayer = SiiService(MagicMock(), replay_session, credentials, archive, ArchiveMode.REPLAY)
+    replayer.login()
+
+    assert replayer.get_monthly_report_html(2025, 1) == "<html>ñ</html>"
+    replay_session.get.assert_not_called()
+    with pytest.raises(ArchiveMissError):
+        replayer.get_annual_report_html(2025)
+
+def test_slow_request_is_hedged(mock_session):
+    """Tests that a request slower than usual is duplicated and the first response wins."""
+    credentials = Credentials(rut_num="12345678", dv="9", password="password")
+    policy = LatencyPolicy(hedging=True, min_samples=1, min_hedge_delay=0.01, hedge_budget=1.0)
+    service = SiiService(MagicMock(), mock_session, credentials, latency_policy=policy)
+    release = threading.Event()
+    fast = MagicMock(url="https://loa.sii.cl/x", text="<html>fast</html>")
+    slow = MagicMock(url="https://loa.sii.cl/x", text="<html>slow</html>")
+    responses = iter([fast, slow, fast])
+
+    def get(url, params, timeout):
+        resp = next(responses)
+        if resp is slow:
+            release.wait(5)
+        return resp
+
+    mock_session.get.side_effect = get
+    assert service.get_annual_report_html(2025) == "<html>fast</html>"
+
+    assert service.get_annual_report_html(2025) == "<html>fast</html>"
+    release.set()
+    assert service.latency_stats().hedge_wins == 1
+
+    service.close()
+    assert service._hedge_executor is None
+
+class HtmlAdapter(BaseAdapter):
+    """Transport that answers every request with an empty report."""
+
+    def send(self, request, **kwargs):
+        resp = requests.Response()
+        resp.request = request
+        resp.url = request.url
+        resp.status_code = 200
+        resp._content = b"<html></html>"
+        return resp
+
+    def close(self):
+        pass
+
+def test_hedged_requests_reuse_their_sessions():
+    """Tests that hedged requests run on reused threads, keeping their sessions."""
+    created = []
+
+    def session_factory():
+        session = requests.Session()
+        session.mount("https://", HtmlAdapter())
+        created.append(session)
+        return session
+
+    credentials = Credentials(rut_num="12345678", dv="9", password="password")
+    policy = LatencyPolicy(hedging=True, min_samples=1, min_hedge_delay=1.0)
+    service = SiiService(MagicMock(), ThreadSafeSession(session_factory), credentials, latency_policy=policy)
+
+    for _ in range(50):
+        assert service.get_annual_report_html(2025) == "<html></html>"
+
+    assert len(created) <= 2
+    service.close()
+
+def test_open_circuit_fails_fast(mock_session):
+    """Tests that repeated outages open the circuit and later calls skip the network."""
+    credentials = Credentials(rut_num="12345678", dv="9", password="password")
+    breakers = CircuitBreakerRegistry(failure_threshold=2, reset_timeout=60)
+    service = SiiService(MagicMock(), mock_session, credentials, circuit_breakers=breakers)
+    mock_session.get.side_effect = requests.ConnectionError("unreachable")
+
+    for _ in range(2):
+        with pytest.raises(AuthError):
+            service.get_annual_report_html(2025)
+    with pytest.raises(CircuitOpenError):
+        service.get_monthly_report_html(2025, 1)
+    assert mock_session.get.call_count == 2